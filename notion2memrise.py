@@ -1,18 +1,107 @@
+import argparse
+
 from src import notion
 from src import memrise as mem
 from src import handlers as h
 from src import constants as const
+from src.journal import Journal
+from src.state import StateStore
 
 if __name__ == "__main__":
-    print("Notion2Memrise started")
-    notion_df = notion.get_data_from_notion(const.NOTION_DATABASE_ID)
-    driver = mem.create_driver()
-    driver = mem.sign_in(driver, const.MEMRISE_EMAIL, const.MEMRISE_PASSWORD)
-    driver = h.notion2memrise(
-        driver,
-        notion_df,
-        const.COURSE_EDIT_URL,
-        const.COURSE_DB_URL,
-        const.DB_NAME,
-        const.LEVEL_WORD_LIMIT,
+    parser = argparse.ArgumentParser(description="Sync a Notion database to Memrise.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only fetch the Notion entries edited since the last run",
+        )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="don't query Notion, replay the entries cached by the last run",
+        )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="only print the changes that would be made on Memrise",
+        )
+    parser.add_argument(
+        "--full-scan",
+        action="store_true",
+        help="scrape the whole Memrise course instead of reading the state of the "
+             "last run, e.g. after editing the course by hand",
         )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="resume a run that didn't finish from its journal, instead of scanning "
+             "the whole course again",
+        )
+    parser.add_argument(
+        "--http-read",
+        action="store_true",
+        help="read the Memrise course over HTTP with the cookies of the browser, "
+             "which is then only used for the writes",
+        )
+    parser.add_argument(
+        "--from-db",
+        action="store_true",
+        help="with --http-read, scan the whole course from its paginated database "
+             "instead of its levels",
+        )
+    args = parser.parse_args()
+
+    print("Notion2Memrise started")
+    notion_id_list = None
+    with notion.PageCache() as cache:
+        if args.offline:
+            notion_df = notion.get_data_from_cache(const.NOTION_DATABASE_ID, cache)
+        else:
+            watermark = None
+            if args.incremental:
+                watermark = notion.load_watermark(const.NOTION_DATABASE_ID)
+            with notion.NotionClient() as client:
+                notion_df = notion.get_data_from_notion(
+                    const.NOTION_DATABASE_ID, client, edited_since=watermark,
+                    cache=cache)
+                if watermark is not None:
+                    notion_id_list = notion.get_page_ids_from_notion(
+                        const.NOTION_DATABASE_ID, client)
+            if notion_id_list is not None:
+                # the cache holds the entries that were not edited
+                cache.keep_only(const.NOTION_DATABASE_ID, notion_id_list)
+                notion_df = notion.get_data_from_cache(const.NOTION_DATABASE_ID, cache)
+    driver = None
+    reader = None
+    try:
+        with StateStore() as state, Journal() as journal:
+            # a plan read from the state store doesn't need the browser
+            if not (args.plan and not args.full_scan and journal.empty
+                    and state.is_scanned(const.COURSE_EDIT_URL)):
+                driver = mem.create_driver()
+                driver = mem.sign_in(
+                    driver, const.MEMRISE_EMAIL, const.MEMRISE_PASSWORD)
+                if args.http_read or args.from_db:
+                    reader = mem.MemriseReader.from_driver(driver)
+            driver = h.notion2memrise(
+                driver,
+                notion_df,
+                const.COURSE_EDIT_URL,
+                const.COURSE_DB_URL,
+                const.DB_NAME,
+                const.LEVEL_WORD_LIMIT,
+                notion_id_list,
+                dry_run=args.plan,
+                state=state,
+                full_scan=args.full_scan,
+                journal=journal,
+                resume=args.resume,
+                reader=reader,
+                read_from_db=args.from_db,
+                )
+    finally:
+        if reader is not None:
+            reader.close()
+        if driver is not None:
+            driver.quit()
+    if not args.plan:
+        notion.save_watermark(const.NOTION_DATABASE_ID, notion_df)
@@ -20,6 +20,15 @@ COL_LIST = [
 ]
 # columns that should not have nas
 NOT_NULL_COL_LIST = ["French", "English", "date modified", "cell id"]
+# columns whose content is compared to find the words updated on Notion
+HASH_COL_LIST = [col for col in COL_LIST if col not in ["cell id", "date modified"]]
+# columns with few distinct values (selects), stored as categoricals
+CATEGORY_COL_LIST = ["Part of Speech", "Gender", "Tags", "Model"]
+# whether duplicates are also found across accents, e.g. "où" and "ou". Off because
+# they are different words in French.
+FOLD_ACCENTS = False
+# where a word is on Memrise: ID of its level, ID of its thing, and row in the level
+LOCATION_COL_LIST = ["level id", "thing id", "position"]
 COURSE_EDIT_URL = "https://app.memrise.com/course/6512551/my-french-2/edit/"
 COURSE_DB_URL = "https://app.memrise.com/course/6512551/my-french-2/edit/database/7568262/"  # noqa: E501
 LEVEL_WORD_LIMIT = 20
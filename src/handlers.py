@@ -1,11 +1,18 @@
 """This module contains the functions that handle the data from Notion and Memrise."""
 
+from typing import Union
+
 import numpy as np
 import pandas as pd
 from selenium.webdriver import Remote
 
 from src import memrise as mem
-from src import utils as ut
+from src import plan as pl
+from src.constants import COL_LIST, LOCATION_COL_LIST
+from src.journal import Journal
+from src.records import WordTable
+from src.results import ResultCollector, summarize
+from src.state import StateStore
 
 COL_ORDER_LIST = ["French", "cell id", "action", "success", "error"]
 
@@ -15,14 +22,26 @@ def notion2memrise(
         course_edit_url: str,
         course_db_url: str,
         db_name: str,
-        level_word_limit: int
+        level_word_limit: int,
+        notion_id_list: list = None,
+        dry_run: bool = False,
+        state: StateStore = None,
+        full_scan: bool = False,
+        journal: Journal = None,
+        resume: bool = False,
+        reader: mem.MemriseReader = None,
+        read_from_db: bool = False,
         ):
     """Handles the data from Notion and Memrise.
 
-    Creates a Selenium driver, signs in to Memrise, gets all the words from Memrise,
-    handles the duplicates from Notion, handles the words deleted from Notion, handles
-    the words that were already on Memrise and got updated on Notion, handles the new
-    words from Notion, and finally quits the driver.
+    Gets all the words from Memrise (or from the state store), plans the changes (see
+    `plan.make_plan`), then handles the duplicates from Notion, the words deleted from
+    Notion, the words that were already on Memrise and got updated on Notion, and the
+    new words from Notion.
+
+    A word is updated only if the hash of its content (see `utils.content_hash`)
+    differs between Notion and Memrise, so touching a word on Notion without
+    changing it doesn't send it to Memrise again.
 
     Args:
         driver (selenium.webdriver.Remote): driver of the browser.
@@ -32,63 +51,184 @@ def notion2memrise(
         db_name (str): name of the database of the course on memrise.
             This is found when you click on Databases tab in the edit page. 
         level_word_limit (int): number of words per level.
+        notion_id_list (list, optional): IDs of all the entries in the Notion database.
+            Pass it when `notion_df` only contains the entries edited since the last
+            run, so that the words deleted from Notion are still found. Defaults to
+            the cell ids of `notion_df`.
+        dry_run (bool, optional): if True, only print the plan without changing
+            anything on Memrise. The plan is built from an in-memory copy of the state
+            store, so the store is not changed either. Defaults to False.
+        state (src.state.StateStore, optional): store of the words synced by the
+            previous runs. If passed, the words on Memrise are read from it instead of
+            scraping the whole course, and it is updated as the words are synced.
+            Defaults to None, i.e. always scrape.
+        full_scan (bool, optional): whether to scrape the whole course even if the
+            state store has its words, e.g. after editing the course by hand. The
+            store is then rebuilt from the scraped words. Defaults to False.
+        journal (src.journal.Journal, optional): journal of the operations confirmed on
+            Memrise, emptied when the run finishes. If the last run didn't finish, the
+            whole course is scraped unless `resume` is True. Defaults to None.
+        resume (bool, optional): whether to resume the last run from the journal. The
+            operations it confirmed are applied to the state store, so the plan skips
+            them, and only the levels of the words it sent without confirming them are
+            scraped. Defaults to False.
+        reader (src.memrise.MemriseReader, optional): reader to scrape the course over
+            HTTP with, e.g. `MemriseReader.from_driver(driver)`. The browser is then
+            only used for the writes. Defaults to None, i.e. scrape with the browser.
+        read_from_db (bool, optional): whether the reader scrapes the whole course from
+            its paginated database instead of its levels. The database doesn't tell the
+            level of the words, so the updates then search all the levels. Defaults to
+            False.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after the words are added, updated,
         or deleted.
     """
     notion_df = mem.validate_input(notion_df)
-    if notion_df.empty:
+    if notion_df.empty and notion_id_list is None:
         print("Notion Database is empty.")
-        return
-
-    global_res_df = pd.DataFrame({col: [] for col in COL_ORDER_LIST})
-    # sort from oldest to newest so that older words get added first later
-    notion_df.sort_values(by="date modified", inplace=True, ascending=True)
-
-    # handle duplicates from notion (case insensitive)
-    # print them out to the user and keep the most recent one
-    notion_df, duplicate_res_df = handle_notion_duplicates(notion_df)
-    global_res_df = pd.concat([global_res_df, duplicate_res_df])
-
-    # read words from memrise
-    driver, memrise_df = mem.get_all_words(driver, course_edit_url)
-
-    if not memrise_df.empty:
-        memrise_df.sort_values(by="date modified", inplace=True, ascending=False)
-        memrise_df["source"] = "memrise"
-        memrise_most_recent = pd.to_datetime(memrise_df.iloc[0]["date modified"])
-        # handle words deleted from notion
-        deleted_from_notion_df = ut.anti_join(memrise_df, notion_df, "cell id")
-        driver, delete_res_df = handle_deleted_from_notion(
-            driver, deleted_from_notion_df, course_db_url, course_edit_url)
-        global_res_df = pd.concat([global_res_df, delete_res_df])
-        # get new words from notion
-        notion_df = notion_df[notion_df["date modified"] > memrise_most_recent]
-        # handle words that were already on memrise and got updated on notion
-        update_from_notion_df = ut.semi_join(notion_df, memrise_df, "cell id")
-        driver, updated_res_df = handle_updated_from_notion(
-            driver, update_from_notion_df, course_edit_url)
-        global_res_df = pd.concat([global_res_df, updated_res_df])
-        # update notion_df to only contain the words that are not in memrise
-        notion_df = notion_df[np.logical_not(
-            notion_df["cell id"].isin(update_from_notion_df["cell id"]))]
-
-    # handle new words from notion, drop the ones that already got updated
-    driver, added_res_df = handle_new_from_notion(
-        driver, notion_df, course_edit_url,db_name, level_word_limit)
-    global_res_df = pd.concat([global_res_df, added_res_df])
+        return driver
+
+    if dry_run and state is not None:
+        state = state.copy()
+    try:
+        if state is not None and journal is not None and not journal.empty:
+            if resume:
+                driver = _recover_from_journal(
+                    driver, journal, course_edit_url, state, reader)
+            else:
+                print("The last run didn't finish, scanning the whole course.")
+                full_scan = True
+        memrise_df = None
+        if state is not None and not full_scan:
+            memrise_df = state.load(course_edit_url)
+        if memrise_df is None:  # never scanned, or full scan
+            # read words from memrise
+            driver, memrise_df = _read_words(
+                driver, reader, course_edit_url,
+                course_db_url=course_db_url if read_from_db else None)
+            if state is not None:
+                state.replace(course_edit_url, memrise_df)
+        plan = pl.make_plan(notion_df, memrise_df, level_word_limit, notion_id_list)
+        if dry_run:
+            print(plan.summary())
+            return driver
+    finally:
+        if dry_run and state is not None:
+            state.close()  # the copy
+
+    driver, global_res_df = execute_plan(
+        driver, plan, course_edit_url, course_db_url, db_name, level_word_limit, state,
+        journal)
+    if journal is not None:
+        journal.clear()
     now_timestamp = pd.to_datetime("now").strftime("%Y-%m-%d %H:%M:%S")
     global_res_df.to_csv(f"logs/results_{now_timestamp}.csv", index=False)
+    print(summarize(global_res_df).to_string())
     print("All done!")
 
     return driver
 
+def execute_plan(
+        driver: Remote,
+        plan: pl.SyncPlan,
+        course_edit_url: str,
+        course_db_url: str,
+        db_name: str,
+        level_word_limit: int,
+        state: StateStore = None,
+        journal: Journal = None,
+        ):
+    """Executes a sync plan on Memrise.
+
+    Args:
+        driver (selenium.webdriver.Remote): driver of the browser.
+        plan (src.plan.SyncPlan): the plan returned by `plan.make_plan`.
+        course_edit_url (str): url of the edit page of the course.
+        course_db_url (str): url of the database page of the course.
+        db_name (str): name of the database of the course on memrise.
+        level_word_limit (int): number of words per level.
+        state (src.state.StateStore, optional): store updated as the words are
+            synced. Defaults to None.
+        journal (src.journal.Journal, optional): journal to append each operation to
+            as soon as it is confirmed on Memrise. Defaults to None.
+
+    Returns:
+        selenium.webdriver.Remote: the passed driver after the plan is executed.
+        pandas.DataFrame: the result of every operation, with the columns of
+        RESULT_COL_LIST, including how long it took.
+    """
+    collector = ResultCollector(journal)
+    if journal is not None:
+        journal.record_words(pd.concat([plan.to_df("update"), plan.to_df("add")]))
+    # print the duplicates from notion to the user, the most recent one is kept
+    _report_duplicates(plan.table("duplicate_drop"), collector)
+    _report_duplicates(plan.table("duplicate_skip"), collector, on_memrise=True)
+    driver, _ = handle_deleted_from_notion(
+        driver, plan.table("delete"), course_db_url, course_edit_url, state, collector)
+    driver, _ = handle_updated_from_notion(
+        driver, plan.table("update"), course_edit_url, plan.edit_list(),
+        level_dict=plan.level_dict(), state=state, collector=collector)
+    driver, _ = handle_new_from_notion(
+        driver, plan.table("add"), course_edit_url, db_name, level_word_limit, state,
+        collector)
+
+    return driver, collector.to_df()
+
+def _recover_from_journal(
+        driver: Remote,
+        journal: Journal,
+        course_edit_url: str,
+        state: StateStore,
+        reader: mem.MemriseReader = None,
+        ):
+    # applies the operations confirmed by the last run to the state store. The words
+    # sent with a bulk add but never confirmed are looked for in their levels.
+    committed_dict, sent_dict = journal.load()
+    synced_level_dict = {cell_id: level for (op, cell_id), level in committed_dict.items()
+                         if op != "delete"}
+    if sent_dict:
+        driver, level_df = _read_words(
+            driver, reader, course_edit_url, list(dict.fromkeys(sent_dict.values())))
+        found_df = level_df[level_df["cell id"].isin(sent_dict)]
+        synced_level_dict.update(zip(found_df["cell id"], found_df["level id"]))
+    state.delete(course_edit_url,
+                 [cell_id for op, cell_id in committed_dict if op == "delete"])
+    # as they were synced, the words may have changed on Notion since
+    synced_df = WordTable.from_df(journal.load_words()).select(
+        synced_level_dict).to_df()
+    if not synced_df.empty:
+        synced_df["level id"] = synced_df["cell id"].map(synced_level_dict)
+        state.upsert(course_edit_url, synced_df)
+    print(f"Resumed the last run: {len(committed_dict)} operations were already done.")
+
+    return driver
+
+def _read_words(
+        driver: Remote,
+        reader: mem.MemriseReader,
+        course_edit_url: str,
+        level_id_list: list = None,
+        course_db_url: str = None,
+        ):
+    # the words on memrise with their location, read over HTTP if there is a reader,
+    # from the database of the course if its url is passed
+    if reader is not None and course_db_url is not None and level_id_list is None:
+        return driver, reader.get_all_words_from_db(
+            course_db_url, course_edit_url).reindex(
+                columns=COL_LIST + LOCATION_COL_LIST)
+    if reader is None:
+        return mem.get_all_words(
+            driver, course_edit_url, with_location=True, level_id_list=level_id_list)
+    return driver, reader.get_all_words(
+        course_edit_url, with_location=True, level_id_list=level_id_list)
+
 def handle_notion_duplicates(notion_df: pd.DataFrame):
-    """Handles the duplicates from Notion (case insensitive).
+    """Handles the duplicates from Notion.
 
-    Duplicates are checked as case insensitive in the `French` column. The most recent
-    duplicate is kept and the rest are dropped.
+    Duplicates are checked in the `French` column regardless of case, whitespace and
+    Unicode composition (see `utils.normalize_key`). The most recent duplicate is kept
+    and the rest are dropped.
 
     Args:
         notion_df (pandas.DataFrame): dataframe of the entries in the Notion database.
@@ -104,36 +244,72 @@ def handle_notion_duplicates(notion_df: pd.DataFrame):
             - success: True.
     """
     notion_df = mem.validate_input(notion_df)
-    notion_df_copy = notion_df.copy()
-    notion_df_copy["French"] = notion_df_copy["French"].str.lower()
-    notion_duplicate_df = notion_df_copy[
-        notion_df_copy.duplicated(subset=["French"], keep="last")]
-    notion_df = notion_df[np.logical_not(notion_df["cell id"].isin(
-        notion_duplicate_df["cell id"]))]
-    if notion_duplicate_df.empty:
-        return notion_df, pd.DataFrame(columns=COL_ORDER_LIST)
-
-    print("Duplicate words from Notion (case insensitive):")
-    print("**We kept the most recent one**")
-    print(notion_duplicate_df["French"].to_string(index=False))
+    duplicate_mask = pl.find_duplicates(notion_df)
+
+    return notion_df[np.logical_not(duplicate_mask)], _report_duplicates(
+        WordTable.from_df(notion_df[duplicate_mask]))
+
+def _report_duplicates(
+        duplicate_table: WordTable,
+        collector: ResultCollector = None,
+        on_memrise: bool = False,
+        ):
+    # prints the dropped duplicates, or the new words skipped because they are
+    # already on memrise, and returns their result dataframe
+    if duplicate_table.empty:
+        return pd.DataFrame(columns=COL_ORDER_LIST)
+    collector = ResultCollector() if collector is None else collector
+    start = len(collector)
+    op = "duplicate_skip" if on_memrise else "duplicate_drop"
+    for record in duplicate_table:
+        collector.add(op, record.cell_id, True, word=record.word)
+
+    if on_memrise:
+        print("New words from Notion already on Memrise under another cell id:")
+        print("**We didn't add them**")
+    else:
+        print("Duplicate words from Notion (ignoring case and whitespace):")
+        print("**We kept the most recent one**")
+    duplicate_res_df = _to_handler_df(collector.to_df(start))
+    print(duplicate_res_df["French"].to_string(index=False))
+    print("-"*10, "\n")
+
+    return duplicate_res_df
+
+def _report_results(res_df: pd.DataFrame, verb: str, preposition: str):
+    # prints the words that succeeded and failed, and returns the result dataframe
+    # of the handlers
+    res_df = _to_handler_df(res_df)
+    succeeded_df = res_df[res_df["success"]]
+    failed_df = res_df[np.logical_not(res_df["success"])]
+    if not succeeded_df.empty:
+        print(f"{verb.capitalize()} words {preposition} Memrise:")
+        print(succeeded_df["French"].to_string(index=False))
+    if not failed_df.empty:
+        print(f"Not {verb} words {preposition} Memrise:")
+        print(failed_df[["French", "error"]].to_string(index=False))
     print("-"*10, "\n")
-    duplicate_res_df = notion_duplicate_df[["French", "cell id"]]
-    duplicate_res_df[["action", "success"]] = "duplicate_drop", True
 
-    return notion_df, duplicate_res_df[COL_ORDER_LIST]
+    return res_df
+
+def _to_handler_df(res_df: pd.DataFrame):
+    # the columns of COL_ORDER_LIST from the columns of RESULT_COL_LIST
+    return res_df.rename(columns={"word": "French", "op": "action"})[COL_ORDER_LIST]
 
 def handle_deleted_from_notion(
         driver: Remote,
-        deleted_from_notion_df: pd.DataFrame,
+        deleted_from_notion_df: Union[pd.DataFrame, WordTable],
         course_db_url: str,
         course_edit_url,
+        state: StateStore = None,
+        collector: ResultCollector = None,
         ):
     """Handles the words deleted from Notion.
 
     Args:
         driver (selenium.webdriver.Remote): driver of the browser.
-        deleted_from_notion_df (pandas.DataFrame): dataframe of the words deleted from 
-            Notion.
+        deleted_from_notion_df (pandas.DataFrame or src.records.WordTable): the words
+            deleted from Notion.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after the words are deleted.
@@ -147,38 +323,51 @@ def handle_deleted_from_notion(
             otherwise.
         course_db_url (str): url of the database page of the course.
         course_edit_url (str): url of the edit page of the course.
+        state (src.state.StateStore, optional): store to drop the deleted words from.
+            Defaults to None.
+        collector (src.results.ResultCollector, optional): collector to add the results
+            to, with their durations. Defaults to a new one.
     """
-    deleted_from_notion_df = mem.validate_input(deleted_from_notion_df)
-    if deleted_from_notion_df.empty:
+    deleted_table = WordTable.from_df(deleted_from_notion_df)
+    if deleted_table.empty:
         return driver, pd.DataFrame(columns=COL_ORDER_LIST)
+    collector = ResultCollector() if collector is None else collector
+    collector.word_dict.update(deleted_table.word_dict())
 
     driver, delete_res_df = mem.delete_words(
-        driver, course_edit_url, course_db_url, deleted_from_notion_df["cell id"].tolist())
-    delete_res_df = delete_res_df.merge(
-        deleted_from_notion_df, on="cell id", how="left")
-    deleted_words_df = delete_res_df[delete_res_df["deleted"]]
-    not_deleted_words_df = delete_res_df[
-        np.logical_not(delete_res_df["deleted"])]
-    if not deleted_words_df.empty:
-        print("Deleted words from Memrise:")
-        print(deleted_words_df["French"].to_string(index=False))
-    if not not_deleted_words_df.empty:
-        print("Not deleted words from Memrise:")
-        print(not_deleted_words_df[["French", "error"]].to_string(index=False))
-    print("-"*10, "\n")
-    delete_res_df = delete_res_df[["French", "cell id", "deleted", "error"]]
-    delete_res_df["action"] = "delete"
-    delete_res_df.rename(columns={"deleted": "success"}, inplace=True)
+        driver, course_edit_url, course_db_url, deleted_table.cell_id_list, collector)
+    if state is not None:
+        state.delete(
+            course_edit_url, delete_res_df.loc[delete_res_df["success"], "cell id"])
 
-    return driver, delete_res_df[COL_ORDER_LIST]
+    return driver, _report_results(delete_res_df, "deleted", "from")
 
-def handle_updated_from_notion(driver: Remote, update_from_notion_df: pd.DataFrame, course_edit_url: str):
+def handle_updated_from_notion(
+        driver: Remote,
+        update_from_notion_df: Union[pd.DataFrame, WordTable],
+        course_edit_url: str,
+        edit_list: list = None,
+        level_dict: dict = None,
+        state: StateStore = None,
+        collector: ResultCollector = None,
+        ):
     """Handles the words that were already on Memrise and got updated on Notion.
 
     Args:
         driver (selenium.webdriver.Remote): driver of the browser.
-        update_from_notion_df (pandas.DataFrame): dataframe of the words that were already
-            on Memrise and got updated on Notion.
+        update_from_notion_df (pandas.DataFrame or src.records.WordTable): the words
+            that were already on Memrise and got updated on Notion.
+        course_edit_url (str): url of the edit page of the course.
+        edit_list (list, optional): edits (cell id, column, new value) of the words,
+            e.g. from `utils.diff_cells`. If passed, only these cells are rewritten.
+            Defaults to rewriting every column of the words.
+        level_dict (dict, optional): maps the cell ids to the IDs of their levels on
+            Memrise. If it has the level of every word, only these levels are
+            expanded. Defaults to expanding all the levels.
+        state (src.state.StateStore, optional): store to record the updated words in.
+            Defaults to None.
+        collector (src.results.ResultCollector, optional): collector to add the results
+            to, with their durations. Defaults to a new one.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after the words are updated.
@@ -193,40 +382,38 @@ def handle_updated_from_notion(driver: Remote, update_from_notion_df: pd.DataFra
                 - error: error message if the word was not updated successfully, NaN
                 otherwise.
     """
-    update_from_notion_df = mem.validate_input(update_from_notion_df)
-    if update_from_notion_df.empty:
+    update_table = WordTable.from_df(update_from_notion_df)
+    if update_table.empty:
         return driver, pd.DataFrame(columns=COL_ORDER_LIST)
-    driver, updated_res_df = mem.update_words(
-        driver, course_edit_url, update_from_notion_df)
-    updated_res_df = updated_res_df.merge(
-        update_from_notion_df, on="cell id", how="left")
-    updated_words_df = updated_res_df[updated_res_df["updated"]]
-    not_updated_words_df = updated_res_df[np.logical_not(updated_res_df["updated"])]
-    if not updated_words_df.empty:
-        print("Updated words on Memrise:")
-        print(updated_words_df["French"].to_string(index=False))
-    if not not_updated_words_df.empty:
-        print("Not updated words on Memrise:")
-        print(not_updated_words_df[["French", "error"]].to_string(index=False))
-    print("-"*10, "\n")
-    updated_res_df = updated_res_df[["French", "cell id", "updated", "error"]]
-    updated_res_df["action"] = "update"
-    updated_res_df.rename(columns={"updated": "success"}, inplace=True)
-
-    return driver, updated_res_df[COL_ORDER_LIST]
+    collector = ResultCollector() if collector is None else collector
+    collector.word_dict.update(update_table.word_dict())
+    if edit_list is None:
+        driver, updated_res_df = mem.update_words(
+            driver, course_edit_url, update_table, level_dict, collector)
+    else:
+        driver, updated_res_df = mem.update_cells(
+            driver, course_edit_url, edit_list, level_dict, collector)
+    if state is not None:
+        state.upsert(course_edit_url, update_table.select(
+            updated_res_df.loc[updated_res_df["success"], "cell id"]).to_df())
+
+    return driver, _report_results(updated_res_df, "updated", "on")
 
 def handle_new_from_notion(
         driver: Remote,
-        new_from_notion_df: pd.DataFrame,
+        new_from_notion_df: Union[pd.DataFrame, WordTable],
         course_edit_url: str,
         db_name: str,
         level_word_limit: int,
+        state: StateStore = None,
+        collector: ResultCollector = None,
         ):
     """Handles the new words from Notion.
 
     Args:
         driver (selenium.webdriver.Remote): driver of the browser.
-        new_from_notion_df (pandas.DataFrame): dataframe of the new words from Notion.
+        new_from_notion_df (pandas.DataFrame or src.records.WordTable): the new words
+            from Notion.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after the words are added.
@@ -239,23 +426,18 @@ def handle_new_from_notion(
             - error: error message if the word was not added successfully, NaN
             otherwise.
     """
-    new_from_notion_df = mem.validate_input(new_from_notion_df)
-    if new_from_notion_df.empty:
+    new_table = WordTable.from_df(new_from_notion_df)
+    if new_table.empty:
         return driver, pd.DataFrame(columns=COL_ORDER_LIST)
+    collector = ResultCollector() if collector is None else collector
+    collector.word_dict.update(new_table.word_dict())
     driver, added_res_df = mem.add_words(
-        driver, course_edit_url, db_name, new_from_notion_df, level_word_limit)
-    added_res_df = added_res_df.merge(new_from_notion_df, on="cell id", how="left")
-    added_words_df = added_res_df[added_res_df["added"]]
-    not_added_words_df = added_res_df[np.logical_not(added_res_df["added"])]
-    if not added_words_df.empty:
-        print("Added words to Memrise:")
-        print(added_words_df["French"].to_string(index=False))
-    if not not_added_words_df.empty:
-        print("Not added words to Memrise:")
-        print(not_added_words_df[["French", "error"]].to_string(index=False))
-    print("-"*10, "\n")
-    added_res_df = added_res_df[["French", "cell id", "added", "error"]]
-    added_res_df["action"] = "add"
-    added_res_df.rename(columns={"added": "success"}, inplace=True)
-
-    return driver, added_res_df[COL_ORDER_LIST]
+        driver, course_edit_url, db_name, new_table, level_word_limit, collector)
+    if state is not None:
+        added_words_df = added_res_df[added_res_df["success"]]
+        state_df = new_table.select(added_words_df["cell id"]).to_df()
+        state_df["level id"] = state_df["cell id"].map(
+            dict(zip(added_words_df["cell id"], added_words_df["level"])))
+        state.upsert(course_edit_url, state_df)
+
+    return driver, _report_results(added_res_df, "added", "to")
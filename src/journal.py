@@ -0,0 +1,145 @@
+"""This module keeps a journal of the operations confirmed on Memrise during a run.
+
+Each confirmed add, update or delete is appended to a JSON lines file and synced to
+the disk before the run goes on, so a run that dies part-way through can be resumed
+without redoing or duplicating the operations that were already made. The words sent
+with a bulk add are journaled before they are sent, because the browser can die
+before they are confirmed. The content of the words is journaled before the run
+starts, so the state store records them as they were synced, not as they are on
+Notion when the run is resumed.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src import utils as ut
+from src.constants import COL_LIST
+
+JOURNAL_PATH = "state/journal.jsonl"
+# operations that change the course
+JOURNAL_OP_LIST = ["add", "update", "delete"]
+CELL_ID_INDEX = COL_LIST.index("cell id")
+
+
+class Journal:
+    """Append-only journal of the operations of a run.
+
+    Args:
+        path (str, optional): path of the JSON lines file. Defaults to JOURNAL_PATH.
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the journal file."""
+        self.file.close()
+
+    def _append(self, entry_dict: dict):
+        self.file.write(json.dumps(entry_dict) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record(self, op: str, cell_id: str, level: str = None):
+        """Appends a confirmed operation.
+
+        Args:
+            op (str): "add", "update" or "delete".
+            cell_id (str): ID of the word on Notion.
+            level (str, optional): ID of the level of the word on Memrise.
+        """
+        self._append({"op": op, "cell id": cell_id,
+                      "level": None if pd.isna(level) else level})
+
+    def record_sent(self, cell_id_list, level: str):
+        """Appends the words sent to a level with a bulk add, before they are confirmed.
+
+        Args:
+            cell_id_list (list): IDs of the words on Notion.
+            level (str): ID of the level on Memrise.
+        """
+        self._append({"op": "add_sent", "cell id": list(cell_id_list), "level": level})
+
+    def record_words(self, word_df: pd.DataFrame):
+        """Appends the content of the words about to be added or updated.
+
+        Args:
+            word_df (pandas.DataFrame): the words, with the columns of COL_LIST.
+        """
+        self._append({"op": "words", "rows": [
+            [None if pd.isna(value) else ut.canonical_value(value) for value in row]
+            for row in word_df[COL_LIST].itertuples(index=False, name=None)]})
+
+    def _read(self):
+        # the entries of the journal
+        self.file.flush()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:  # the last line of a killed run
+                    continue
+
+    def load(self):
+        """Reads the journal.
+
+        Returns:
+            dict: maps (op, cell id) to the level of each confirmed operation.
+            dict: maps the cell ids of the words sent with a bulk add but never
+            confirmed to the ID of their level.
+        """
+        committed_dict = {}
+        sent_dict = {}
+        for entry_dict in self._read():
+            if entry_dict["op"] == "add_sent":
+                sent_dict.update(dict.fromkeys(
+                    entry_dict["cell id"], entry_dict["level"]))
+            elif entry_dict["op"] in JOURNAL_OP_LIST:
+                committed_dict[(entry_dict["op"], entry_dict["cell id"])] = (
+                    entry_dict["level"])
+        for op, cell_id in committed_dict:
+            if op == "add":
+                sent_dict.pop(cell_id, None)
+
+        return committed_dict, sent_dict
+
+    def load_words(self):
+        """Reads the content of the words journaled with `record_words`.
+
+        Returns:
+            pandas.DataFrame: the last journaled content of each word, with the columns
+            of COL_LIST.
+        """
+        row_dict = {}
+        for entry_dict in self._read():
+            if entry_dict["op"] == "words":
+                row_dict.update((row[CELL_ID_INDEX], row) for row in entry_dict["rows"])
+        word_df = pd.DataFrame.from_records(
+            [[np.nan if value is None else value for value in row]
+             for row in row_dict.values()], columns=COL_LIST)
+        word_df["date modified"] = pd.to_datetime(word_df["date modified"], utc=True)
+
+        return word_df
+
+    @property
+    def empty(self):
+        """bool: whether nothing was journaled, i.e. the last run finished."""
+        self.file.flush()
+        return os.path.getsize(self.path) == 0
+
+    def clear(self):
+        """Empties the journal, e.g. at the end of a run that finished."""
+        self.file.truncate(0)
+        self.file.flush()
+        os.fsync(self.file.fileno())
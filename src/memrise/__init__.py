@@ -2,6 +2,7 @@ from src.memrise.edit import (
     add_words,
     delete_words,
     get_all_words,
+    update_cells,
     update_words,
 )
 from src.memrise.utils import (
@@ -9,4 +10,5 @@ from src.memrise.utils import (
     create_driver,
     sign_in,
     validate_input,
-)
\ No newline at end of file
+)
+from src.memrise.reader import MemriseReader
@@ -11,3 +11,40 @@ SAVE_CHANGES_CLASS = "btn btn-success"
 MODAL_BACKDROP_CLASS = "modal-backdrop fade"
 YES_NO_MODAL_ID = "modal-yesno"
 UPDATE_CELL_JAVA_SCRIPT = """arguments[0].value = arguments[1];arguments[0].blur();"""
+# clicks the show button of every folded level, then calls back with the number of
+# levels once every level shows its table. The observer is kept on window, so it can
+# be disconnected if the script times out.
+SHOW_ALL_LEVELS_JAVA_SCRIPT = """
+var done = arguments[arguments.length - 1];
+var showSelector = "a[class='show-hide btn btn-small']";
+var tableSelector = "table[class='level-things table ui-sortable']";
+var levelList = Array.from(document.querySelectorAll("div[data-level-id]")).filter(
+    function (level) { return level.querySelector(showSelector); });
+function allShown() {
+    return document.querySelectorAll(tableSelector).length >= levelList.length;
+}
+levelList.forEach(function (level) {
+    if (!level.querySelector(tableSelector)) {
+        level.querySelector(showSelector).click();
+    }
+});
+if (allShown()) {
+    done(levelList.length);
+} else {
+    window.showAllLevelsObserver = new MutationObserver(function () {
+        if (allShown()) {
+            window.showAllLevelsObserver.disconnect();
+            done(levelList.length);
+        }
+    });
+    window.showAllLevelsObserver.observe(document.body, {childList: true, subtree: true});
+}
+"""
+DISCONNECT_SHOW_ALL_LEVELS_JAVA_SCRIPT = """
+if (window.showAllLevelsObserver) {
+    window.showAllLevelsObserver.disconnect();
+}
+"""
+LEVEL_SHOW_TIME = 0.5  # in seconds, added to TIMEOUT_LIMIT per folded level
+# script timeout of the WebDriver spec, which Selenium 3 can't read back
+DEFAULT_SCRIPT_TIMEOUT = 30  # in seconds
@@ -1,20 +1,23 @@
 """Functions to control Memrise account and course."""
 
-from time import sleep
+from itertools import groupby
+from operator import itemgetter
+from time import perf_counter, sleep
 from typing import List, Literal, Union
 import pandas as pd
 import numpy as np
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver import Remote
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.remote.webelement import WebElement
 
-from src.constants import COL_LIST
 from src.memrise import constants as cont
 from src.memrise import utils as ut
-from src.memrise.errors import MinNumberOfLevels
+from src.memrise.errors import ColumnNotFound, MinNumberOfLevels
+from src.records import WordTable
+from src.results import ResultCollector
 # TODO: enforce type checking
 
 def _delete_one_word_from_db(driver: Remote, course_edit_url: str, course_db_url: str, cell_id: str):
@@ -50,7 +53,8 @@ def _delete_one_word_from_db(driver: Remote, course_edit_url: str, course_db_url
     # I also loop while refreshing the page so that if there are more than one page
     # of the word, they all get deleted.
     while thing_list:
-        driver, res_df_temp = _delete_db_page(driver, course_edit_url)
+        # the results of the occurrences are not reported, only the one of the word
+        driver = _delete_db_page(driver, course_edit_url, ResultCollector())
         driver.refresh()
         try:
             thing_list = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
@@ -62,7 +66,7 @@ def _delete_one_word_from_db(driver: Remote, course_edit_url: str, course_db_url
     return driver, True, np.nan
 
 
-def _delete_db_page(driver: Remote, course_edit_url: str):
+def _delete_db_page(driver: Remote, course_edit_url: str, collector: ResultCollector):
     """Deletes all entries in a Memrise course database page.
 
     Note: the driver should be at the page desired to be deleted and it should contain
@@ -72,32 +76,44 @@ def _delete_db_page(driver: Remote, course_edit_url: str):
     Args:
         driver (selenium.webdriver.Remote): A selenium webdriver.
         course_edit_url (str): url of the edit page of the course.
+        collector (src.results.ResultCollector): collector of the result of deleting
+            each word.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after deleting the words
-        pandas.DataFrame: a dataframe with the result of deleting each word
+
+    Raises:
+        ColumnNotFound: if the course has no "cell id" column.
     """
     # get the cell col dict to find cell id later
     # save the url for the current page first
     current_page_url = driver.current_url
     driver, col_predicate_dict = ut.cell_col_to_xpath_predicate(driver, course_edit_url)
-    cell_id_predicate = col_predicate_dict["cell id"]
-    driver.get(current_page_url)
-    res_dict = {
-        "cell id": [],  # str
-        "deleted": [],  # bool
-        "error": [],  # str
-    }
+    if driver.current_url != current_page_url:  # the map wasn't cached
+        driver.get(current_page_url)
     thing_list = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
         EC.presence_of_all_elements_located(
             (By.CLASS_NAME, "thing")))
+    if "cell id" not in col_predicate_dict or not thing_list[0].find_elements_by_xpath(
+            f".//td[{col_predicate_dict['cell id']}]"):
+        # the columns changed since they were cached
+        ut.invalidate_column_map(course_edit_url)
+        driver, col_predicate_dict = ut.cell_col_to_xpath_predicate(
+            driver, course_edit_url)
+        driver.get(current_page_url)
+        thing_list = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
+            EC.presence_of_all_elements_located(
+                (By.CLASS_NAME, "thing")))
+        if "cell id" not in col_predicate_dict:
+            raise ColumnNotFound("cell id")
+    cell_id_predicate = col_predicate_dict["cell id"]
     for thing_element in thing_list:
+        start = perf_counter()
         cell_element = thing_element.find_element_by_xpath(
             f".//td[{cell_id_predicate}]")
         text_element = cell_element.find_element_by_xpath(
             ".//div[@class='text']")
         cell_id = text_element.text
-        res_dict["cell id"].append(cell_id)
         try:
             remove_action = thing_element.find_element_by_xpath(
                 ".//i[@data-role='delete']")
@@ -110,17 +126,20 @@ def _delete_db_page(driver: Remote, course_edit_url: str):
             WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
                 EC.invisibility_of_element_located(
                     (By.XPATH, f"//div[@id='{cont.YES_NO_MODAL_ID}']")))
-            res_dict["deleted"] = True
-            res_dict["error"] = np.nan
+            collector.add("delete", cell_id, True, duration=perf_counter() - start)
         except Exception as e:
-            res_dict["deleted"].append(False)
-            res_dict["error"].append(str(e))
+            collector.add("delete", cell_id, False, str(e), perf_counter() - start)
 
-    res_df = pd.DataFrame(res_dict)
-    return driver, res_df
+    return driver
 
 
-def delete_words(driver: Remote, course_edit_url, course_db_url: str, word_ids: Union[List[str], Literal["ALL"]]):
+def delete_words(
+        driver: Remote,
+        course_edit_url,
+        course_db_url: str,
+        word_ids: Union[List[str], Literal["ALL"]],
+        collector: ResultCollector = None,
+):
     """Deletes words from the Memrise course database.
 
     Note: The admin user must be logged in the passed driver.
@@ -131,51 +150,47 @@ def delete_words(driver: Remote, course_edit_url, course_db_url: str, word_ids:
         course_db_url (str): url of the database page of the course.
         word_ids (list of str or "ALL"): list of cell ids of words to be deleted or 
         "ALL" to delete all words.
+        collector (src.results.ResultCollector, optional): collector to add the results
+            to. Defaults to a new one.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after deleting the words
-        pandas.DataFrame: a dataframe with the result of deleting each word
+        pandas.DataFrame: a dataframe with the result of deleting each word, with the
+        columns of RESULT_COL_LIST
     """
+    collector = ResultCollector() if collector is None else collector
+    start = len(collector)
     driver.get(course_db_url)
     # wait until the search button be clickable
     WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
         EC.element_to_be_clickable(
             (By.XPATH, "//button[@class='btn-default btn-ico']")))
-    res_dict = {
-        "cell id": [],  # str
-        "deleted": [],  # bool
-        "error": [],  # str
-    }
     if word_ids == "ALL":
-        res_df = pd.DataFrame(res_dict)
         # loop until you delete all pages of the DB.
         try:
             thing_list = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
                 EC.presence_of_all_elements_located(
                     (By.CLASS_NAME, "thing")))
         except TimeoutException:  # empty DB
-            return driver, res_df
+            return driver, collector.to_df(start)
 
         while thing_list:
             try:
-                driver, res_df_temp = _delete_db_page(driver, course_edit_url)
-                res_df = pd.concat([res_df, res_df_temp])
+                driver = _delete_db_page(driver, course_edit_url, collector)
                 driver.refresh()
                 thing_list = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
                 EC.presence_of_all_elements_located(
                     (By.CLASS_NAME, "thing")))
             except TimeoutException:  # ? what happens if _delete_db_page raises an error?
                 break
-        return driver, res_df
+        return driver, collector.to_df(start)
 
     for cell_id in word_ids:
+        word_start = perf_counter()
         driver, res_bool, error_str = _delete_one_word_from_db(
             driver, course_edit_url, course_db_url, cell_id)
-        res_dict["cell id"].append(cell_id)
-        res_dict["deleted"].append(res_bool)
-        res_dict["error"].append(error_str)
-    res_df = pd.DataFrame(res_dict)
-    return driver, res_df
+        collector.add("delete", cell_id, res_bool, error_str, perf_counter() - word_start)
+    return driver, collector.to_df(start)
 
 
 def _update_cell(driver: Remote, cell_element: WebElement, new_value:str):
@@ -213,63 +228,147 @@ def _update_cell(driver: Remote, cell_element: WebElement, new_value:str):
     return driver
 
 
-def update_words(driver: Remote, course_edit_url: str, word_df: pd.DataFrame):
+def update_words(
+        driver: Remote,
+        course_edit_url: str,
+        word_df: Union[pd.DataFrame, WordTable],
+        level_dict: dict = None,
+        collector: ResultCollector = None,
+):
     """Updates words in the Memrise course.
 
     Note: The admin user must be logged in the passed driver.
 
-    When you update a word in the level page, it also gets updated in the DB.
+    When you update a word in the level page, it also gets updated in the DB. Every
+    column of the words is rewritten, use `update_cells` to only rewrite the cells
+    that changed.
 
     Args:
         driver (selenium.webdriver.Remote): a selenium webdriver.
         course_edit_url (str): url of the edit page of the course.
-        word_df (pandas.DataFrame): dataframe of words to be updated in Memrise.
+        word_df (pandas.DataFrame or src.records.WordTable): words to be updated in
+            Memrise.
+        level_dict (dict, optional): maps the cell ids to the IDs of their levels, see
+            `update_cells`. Defaults to showing all the levels.
+        collector (src.results.ResultCollector, optional): collector to add the results
+            to. Defaults to a new one.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after updating the words
-        pandas.DataFrame: a dataframe with the result of updating each word
+        pandas.DataFrame: a dataframe with the result of updating each word, with the
+        columns of RESULT_COL_LIST
     """
-    word_df = ut.validate_input(word_df)
+    edit_list = [
+        (record.cell_id, col, "" if pd.isna(value) else str(value))
+        for record in WordTable.from_df(word_df)
+        for col, value in record.items() if col != "cell id"
+    ]
+    return update_cells(driver, course_edit_url, edit_list, level_dict, collector)
+
+
+def _find_word(driver: Remote, cell_id: str, table_xpath: str = ""):
+    # returns the element of the cell id of a word in the edit page, searched in the
+    # table of its level first. If the word moved to another level, all the levels
+    # are shown and searched.
+    try:
+        return driver, WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
+            EC.presence_of_element_located(
+                (By.XPATH, f"{table_xpath}//div[text()='{cell_id}']")))
+    except TimeoutException:
+        if not table_xpath:
+            raise
+    driver = ut.show_all_level_tables(driver)
+    return driver, WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
+        EC.presence_of_element_located((By.XPATH, f"//div[text()='{cell_id}']")))
+
+
+def update_cells(
+        driver: Remote,
+        course_edit_url: str,
+        edit_list: List[tuple],
+        level_dict: dict = None,
+        collector: ResultCollector = None,
+):
+    """Updates cells of words in the Memrise course.
+
+    Note: The admin user must be logged in the passed driver.
+
+    Only the passed cells are rewritten, e.g. the edits returned by
+    `src.utils.diff_cells`.
+
+    Args:
+        driver (selenium.webdriver.Remote): a selenium webdriver.
+        course_edit_url (str): url of the edit page of the course.
+        edit_list (list): tuples (cell id, column, new value) of the cells to update,
+            grouped by cell id.
+        level_dict (dict, optional): maps the cell ids to the IDs of their levels, e.g.
+            the "level id" column of `get_all_words(..., with_location=True)`. If it
+            has the level of every word, only these levels are shown and searched.
+            Defaults to showing all the levels.
+        collector (src.results.ResultCollector, optional): collector to add the results
+            to. Defaults to a new one.
+
+    Returns:
+        selenium.webdriver.Remote: the passed driver after updating the cells
+        pandas.DataFrame: a dataframe with the result of updating each word, i.e. all
+        its cells, with the columns of RESULT_COL_LIST
+    """
+    collector = ResultCollector() if collector is None else collector
+    start = len(collector)
+    if not edit_list:
+        return driver, collector.to_df(start)
     driver.get(course_edit_url)
     driver, column_predicate_dict = ut.cell_col_to_xpath_predicate(
         driver, course_edit_url)
-    driver = ut.show_all_level_tables(driver)
-    res_dict = {
-        "cell id": [],  # str
-        "updated": [],  # bool
-        "error": [],  # str
-    }
-    for _, row in word_df.iterrows():
-        res_dict["cell id"].append(row["cell id"])
+    level_dict = level_dict or {}
+    cell_id_list = [cell_id for cell_id, _, _ in edit_list]
+    if all(pd.notna(level_dict.get(cell_id)) for cell_id in cell_id_list):
+        # only the levels of the words, in their order
+        driver = ut.show_level_tables(
+            driver, list(dict.fromkeys(level_dict[cell_id] for cell_id in cell_id_list)))
+    else:
+        level_dict = {}
+        driver = ut.show_all_level_tables(driver)
+    for cell_id, cell_edit_iter in groupby(edit_list, key=itemgetter(0)):
+        word_start = perf_counter()
+        level_id = level_dict.get(cell_id, np.nan)
+        # search in the table of its level if known
+        table_xpath = (f"//table[@data-level-id='{level_dict[cell_id]}']"
+                       if cell_id in level_dict else "")
         try:
-            cell_id_element = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, f"//div[text()='{row['cell id']}']")))
+            driver, cell_id_element = _find_word(driver, cell_id, table_xpath)
             row_element = cell_id_element.find_element_by_xpath('../../..')
-            for col in word_df.columns:
-                if col=="cell id":
-                    continue
-                value = str(row[col]) if pd.notna(row[col]) else ""
-                xpath_predicate = column_predicate_dict[col]
-                cell_element = row_element.find_element_by_xpath(
-                    f".//td[{xpath_predicate}]")
+            for _, col, value in cell_edit_iter:
+                try:
+                    cell_element = row_element.find_element_by_xpath(
+                        f".//td[{column_predicate_dict[col]}]")
+                except (KeyError, NoSuchElementException):
+                    # the columns changed since they were cached
+                    ut.invalidate_column_map(course_edit_url)
+                    driver, column_predicate_dict = ut.cell_col_to_xpath_predicate(
+                        driver, course_edit_url)
+                    if col not in column_predicate_dict:
+                        raise ColumnNotFound(col)
+                    cell_element = row_element.find_element_by_xpath(
+                        f".//td[{column_predicate_dict[col]}]")
                 driver = _update_cell(driver, cell_element, value)
-            res_dict["updated"].append(True)
-            res_dict["error"].append(np.nan)
+            error = np.nan
         except TimeoutException:
-            res_dict["updated"].append(False)
-            res_dict["error"].append(
-                f"TimeoutException: Word not found within {cont.TIMEOUT_LIMIT} seconds"
-            )
+            error = f"TimeoutException: Word not found within {cont.TIMEOUT_LIMIT} seconds"
         except Exception as e:
-            res_dict["updated"].append(False)
-            res_dict["error"].append(str(e))
-    res_df = pd.DataFrame(res_dict)
+            error = str(e)
+        collector.add("update", cell_id, pd.isna(error), error,
+                      perf_counter() - word_start, level_id)
     driver = ut.click_save_changes(driver, course_edit_url)
 
-    return driver, res_df
+    return driver, collector.to_df(start)
 
-def get_all_words(driver, course_edit_url: str):
+def get_all_words(
+        driver,
+        course_edit_url: str,
+        with_location: bool = False,
+        level_id_list: List[str] = None,
+        ):
     """Returns all words in the Memrise course.
 
     Note: The admin user must be logged in the passed driver.
@@ -277,6 +376,11 @@ def get_all_words(driver, course_edit_url: str):
     Args:
         driver (selenium.webdriver.Remote): a selenium webdriver.
         course_edit_url (str): url of the edit page of the course.
+        with_location (bool, optional): whether to add the columns of
+            LOCATION_COL_LIST, i.e. the ID of the level and of the thing of each word,
+            and its position in the level. Defaults to False.
+        level_id_list (list of str, optional): IDs of the levels to read. Defaults to
+            all the levels.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after showing all level tables
@@ -285,45 +389,24 @@ def get_all_words(driver, course_edit_url: str):
     # go to the edit page
     driver.get(course_edit_url)
     # show all tables
-    driver = ut.show_all_level_tables(driver)
-    # get all table element with class="level-things table ui-sortable"
-    table_list = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
-        EC.presence_of_all_elements_located(
-            (By.XPATH, "//table[@class='level-things table ui-sortable']")))
-    all_words_df = pd.DataFrame({}, columns=COL_LIST)
-    if not table_list:
+    if level_id_list is None:
+        driver = ut.show_all_level_tables(driver)
+    else:
+        driver = ut.show_level_tables(driver, level_id_list)
+    # wait until the tables are shown, then parse the whole page once
+    WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
+        EC.presence_of_all_elements_located((By.XPATH, ut.LEVEL_TABLE_XPATH)))
+    page_source = driver.page_source
+    page_df = ut.page_source_to_df(page_source, level_id_list)
+    if page_df is None:
         raise MinNumberOfLevels()
-    for table_element in table_list:
-        # get its name
-        # from its grandparent, concat
-        # text from a div with class="level-handle"
-        # text from an h3 element with class="level-name"
-        level_handle_text = table_element.find_element_by_xpath(
-            "../..//div[@class='level-handle']").text
-        level_name_text = table_element.find_element_by_xpath(
-            "../..//h3[@class='level-name']").text
-        level_name = level_handle_text + "-" + level_name_text
-
-        # to df
-        table_df = ut.table_element_to_df(table_element)
-        table_df.drop(columns="Unnamed: 0",
-                      inplace=True)  # first columns for actions
-        table_df["level"] = level_name
-
-        # concat
-        if not table_df.empty:
-            table_df = table_df[COL_LIST]
-            all_words_df = pd.concat([all_words_df, table_df])
-    # check dtypes and columns order and index
-    columns_with_all_na = all_words_df.columns[all_words_df.isna().all()]
-    all_words_df = all_words_df.astype({col: np.float64 for col in columns_with_all_na})
-    all_words_df["date modified"] = pd.to_datetime(all_words_df["date modified"])
-    all_words_df = all_words_df[COL_LIST].reset_index(drop=True)
+    ut.cache_column_map(course_edit_url, page_source)
+    all_words_df = ut.format_words_df(page_df, with_location)
 
     return driver, all_words_df
 
 
-def _add_bulk(driver, level_id: str, word_df: pd.DataFrame):
+def _add_bulk(driver, level_id: str, word_table: WordTable, collector: ResultCollector):
     """Adds words to a level using the bulk add feature.
 
     The webelement to pass is the div with class="level-options".
@@ -334,12 +417,16 @@ def _add_bulk(driver, level_id: str, word_df: pd.DataFrame):
         driver (selenium.webdriver.Remote): a selenium webdriver
         level_element (selenium.webdriver.remote.webelement.WebElement): a level element.
             It is the div with lass='level' and @data-level-id='{level_id}'.
-        word_df (pandas.DataFrame): dataframe of words to be added to Memrise.
+        word_table (src.records.WordTable): words to be added to Memrise.
+        collector (src.results.ResultCollector): collector of the result of adding each
+            word, with the ID of the level it was added to. The time of the bulk add is
+            shared by its words.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after adding the words
-        pandas.DataFrame: a dataframe with the result of adding each word
+        int: the number of words added
     """
+    start = perf_counter()
     # choose add bulk words
     # wait until the level is shown and get level options and table element
     level_element = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
@@ -356,9 +443,10 @@ def _add_bulk(driver, level_id: str, word_df: pd.DataFrame):
     text_area = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
         EC.element_to_be_clickable((By.XPATH, '//textarea')))
 
-    # past the csv string of word_df
-    word_df_string = word_df.to_csv(index=False, sep="\t", header=False)
-    text_area.send_keys(word_df_string)
+    # past the csv string of the words
+    collector.add_sent(word_table.cell_id_list, level_id)
+    word_table_string = word_table.to_df().to_csv(index=False, sep="\t", header=False)
+    text_area.send_keys(word_table_string)
 
     # click on add button
     add_btn = driver.find_element_by_xpath("//a[text()='Add']")
@@ -372,31 +460,26 @@ def _add_bulk(driver, level_id: str, word_df: pd.DataFrame):
     sleep(1)
     # ? save things?
 
-    # loop over the rows of word_df and check if the word is in the page
-    res_dict = {"cell id": [],  # str
-                "added": [],  # bool
-                "error": [],  # str
-                }
-    for cell_id in word_df["cell id"].values:
-        res_dict["cell id"].append(cell_id)
+    # loop over the words and check if the word is in the page
+    bulk_duration = (perf_counter() - start) / len(word_table)
+    n_added = 0
+    for cell_id in word_table.cell_id_list:
+        word_start = perf_counter()
         try:
             WebDriverWait(driver, cont.WORD_SEARCH_TIME_OUT).until(
                 EC.presence_of_element_located(
                     (By.XPATH, f'//div[text()="{cell_id}"]')))
-            res_dict["added"].append(True)
-            res_dict["error"].append(np.nan)
+            error = np.nan
+            n_added += 1
         except TimeoutException:
-            res_dict["added"].append(False)
-            res_dict["error"].append(
-                f"TimeoutException: Word not found within {cont.WORD_SEARCH_TIME_OUT} seconds"
-            )
+            error = (f"TimeoutException: Word not found within "
+                     f"{cont.WORD_SEARCH_TIME_OUT} seconds")
         except Exception as e:
-            res_dict["added"].append(False)
-            res_dict["error"].append(str(e))
-
-    res_df = pd.DataFrame(res_dict)
+            error = str(e)
+        collector.add("add", cell_id, pd.isna(error), error,
+                      bulk_duration + perf_counter() - word_start, level_id)
 
-    return driver, res_df
+    return driver, n_added
 
 
 
@@ -404,8 +487,9 @@ def add_words(
         driver: Remote,
         course_edit_url: str,
         db_name: str,
-        word_df: pd.DataFrame,
-        level_word_limit: int
+        word_df: Union[pd.DataFrame, WordTable],
+        level_word_limit: int,
+        collector: ResultCollector = None,
 ):
     """Adds words to the Memrise course.
 
@@ -421,20 +505,21 @@ def add_words(
         db_name (str): name of the database of the course on memrise.
             This is found when you click on Databases tab in the edit page. 
         level_word_limit (int): number of words per level.
-        word_df (pandas.DataFrame): dataframe of words to be added to Memrise.
+        word_df (pandas.DataFrame or src.records.WordTable): words to be added to
+            Memrise.
+        collector (src.results.ResultCollector, optional): collector to add the results
+            to. Defaults to a new one.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after adding the words
-        pandas.DataFrame: a dataframe with the result of adding each word
+        pandas.DataFrame: a dataframe with the result of adding each word, with the
+        columns of RESULT_COL_LIST. "level" is the ID of the level it was added to.
     """
-    word_df = ut.validate_input(word_df)  # only valid
-    if word_df.empty:
-        res_df = pd.DataFrame({
-            "cell id": [],  # str
-            "added": [],  # bool
-            "error": [],  # str
-        })
-        return driver, res_df
+    collector = ResultCollector() if collector is None else collector
+    start = len(collector)
+    word_table = WordTable.from_df(word_df)  # only valid
+    if word_table.empty:
+        return driver, collector.to_df(start)
     # go to the edit page
     driver.get(course_edit_url)
     # loop over levels
@@ -448,7 +533,6 @@ def add_words(
         for level_collapsed_element in level_collapsed_list
     ]
     i = 0
-    res_df = pd.DataFrame()
     for level_id in level_id_list:
         level_collapsed_element = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
             EC.presence_of_element_located(
@@ -459,27 +543,25 @@ def add_words(
         driver.execute_script("arguments[0].click();", show_btn)
         level_word_count = ut.count_level_words(driver, level_id)
         # if the level is empty, add words to it
-        if level_word_count == 0 and i < len(word_df):  # only if there are more words
-            driver, tmp_res_df = _add_bulk(
-                driver, level_id, word_df.iloc[i:i+level_word_limit])
-            level_word_count += len(tmp_res_df[tmp_res_df["added"]])
+        if level_word_count == 0 and i < len(word_table):  # only if there are more words
+            driver, n_added = _add_bulk(
+                driver, level_id, word_table[i:i+level_word_limit], collector)
+            level_word_count += n_added
             i += level_word_limit
-            res_df = pd.concat([res_df, tmp_res_df])
 
     # here, level_element is the last level
     # add words to it if it is not full
     if len(level_id_list) > 0:  # so level_id is defined
-        if level_word_count < level_word_limit and i < len(word_df):
+        if level_word_count < level_word_limit and i < len(word_table):
             n_words_to_add = level_word_limit - level_word_count
-            driver, tmp_res_df = _add_bulk(
-                driver, level_id, word_df.iloc[i:i+n_words_to_add])
+            driver, _ = _add_bulk(
+                driver, level_id, word_table[i:i+n_words_to_add], collector)
             i += n_words_to_add
-            res_df = pd.concat([res_df, tmp_res_df])
     # create new levels if needed
-    word_df = word_df.iloc[i:] if i < len(word_df) else pd.DataFrame()
+    word_table = word_table[i:]
     # cut the remaining words level_word_limit words per level and create new levels
-    for i in range(0, len(word_df), level_word_limit):
-        batch_df = word_df.iloc[i:i+level_word_limit]
+    for i in range(0, len(word_table), level_word_limit):
+        batch_table = word_table[i:i+level_word_limit]
         # create a new level
         driver = ut.create_new_level(driver, db_name)
         # the page will refresh and the new level will be the only level not collapsed
@@ -494,7 +576,6 @@ def add_words(
                 (By.XPATH, "//div[@class='level']")))
         level_id = level_element.get_attribute("data-level-id")
         # add words to the new level
-        driver, tmp_res_df = _add_bulk(driver, level_id, batch_df)
-        res_df = pd.concat([res_df, tmp_res_df])
+        driver, _ = _add_bulk(driver, level_id, batch_table, collector)
 
-    return driver, res_df
+    return driver, collector.to_df(start)
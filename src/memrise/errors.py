@@ -2,4 +2,17 @@
 class MinNumberOfLevels(Exception):
     def __init__(self):
         self.message = "The course must have at least two levels"
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+
+class NotDatabasePage(Exception):
+    def __init__(self, url: str):
+        self.message = (f"{url} is not the database of the course, check that the user"
+                        " is signed in")
+        super().__init__(self.message)
+
+
+class ColumnNotFound(Exception):
+    def __init__(self, col: str):
+        self.message = f"Column '{col}' not found on Memrise"
+        super().__init__(self.message)
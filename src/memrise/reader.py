@@ -0,0 +1,231 @@
+"""This module reads a Memrise course over HTTP, without driving the browser.
+
+Reading only needs the authenticated pages, so the cookies of the signed-in driver are
+copied into a pooled `requests.Session`, and the browser is left for the writes. The
+tables of the levels are fetched concurrently and parsed like the page source of the
+browser (see `utils.page_source_to_df`).
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from urllib.parse import urljoin
+
+import requests
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from selenium.webdriver import Remote
+
+from src.constants import COL_LIST
+from src.memrise import constants as cont
+from src.memrise import utils as ut
+from src.memrise.errors import MinNumberOfLevels, NotDatabasePage
+
+# returns the editing html of a level, the same as clicking its show button
+LEVEL_HTML_PATH = "/ajax/level/editing_html/"
+LEVEL_HTML_KEY = "rendered"  # key of the html in the JSON response
+MAX_WORKERS = 4  # levels fetched at once
+LEVEL_XPATH = "//div[contains(@class, 'level') and @data-level-id]"
+
+
+class MemriseReader:
+    """Reads the pages of a Memrise course with a pooled session.
+
+    Args:
+        session (requests.Session, optional): session with the cookies of the signed-in
+            user, e.g. from `MemriseReader.from_driver`. Defaults to a new session with
+            a connection pool of `max_workers`.
+        max_workers (int, optional): number of pages fetched at once. Defaults to
+            MAX_WORKERS.
+        column_map_path (str, optional): path of the JSON file to cache the column maps
+            in, see `cache_column_map`. Defaults to COLUMN_MAP_PATH.
+
+    Attributes:
+        n_requests (int): number of requests sent.
+    """
+
+    def __init__(
+            self,
+            session: requests.Session = None,
+            max_workers: int = MAX_WORKERS,
+            column_map_path: str = ut.COLUMN_MAP_PATH,
+            ):
+        if session is None:
+            session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        self.session = session
+        self.max_workers = max_workers
+        self.column_map_path = column_map_path
+        self.n_requests = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_driver(cls, driver: Remote, **kwargs):
+        """Returns a reader signed in with the cookies of the driver.
+
+        Args:
+            driver (selenium.webdriver.Remote): a driver where the admin user is signed
+                in, e.g. from `sign_in`.
+            **kwargs: the other arguments of MemriseReader.
+
+        Returns:
+            MemriseReader: the reader.
+        """
+        session = requests.Session()
+        for cookie in driver.get_cookies():
+            session.cookies.set(
+                cookie["name"], cookie["value"], domain=cookie.get("domain"),
+                path=cookie.get("path", "/"))
+        session.headers["User-Agent"] = driver.execute_script(
+            "return navigator.userAgent;")
+        return cls(session, **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the connections of the session."""
+        self.session.close()
+
+    def get_html(self, url: str, params: dict = None):
+        """Returns the html of a page.
+
+        Args:
+            url (str): url of the page.
+            params (dict, optional): query parameters. Defaults to None.
+
+        Returns:
+            str: the html of the page.
+
+        Raises:
+            requests.HTTPError: if the page is not found or the user is not signed in.
+        """
+        with self._lock:
+            self.n_requests += 1
+        response = self.session.get(url, params=params, timeout=cont.TIMEOUT_LIMIT)
+        response.raise_for_status()
+        return response.text
+
+    def get_level_html(self, course_edit_url: str, level_id: str):
+        """Returns the editing html of a level, with the table of its words.
+
+        Args:
+            course_edit_url (str): url of the edit page of the course.
+            level_id (str): ID of the level.
+
+        Returns:
+            str: the html of the level.
+
+        Raises:
+            ValueError: if the response is JSON without the html of the level, e.g. an
+                error.
+        """
+        text = self.get_html(
+            urljoin(course_edit_url, LEVEL_HTML_PATH), {"level_id": level_id})
+        try:  # the html may come wrapped in a JSON object
+            content = json.loads(text)
+        except json.JSONDecodeError:
+            return text
+        if not isinstance(content, dict) or not isinstance(
+                content.get(LEVEL_HTML_KEY), str):
+            raise ValueError(f"No html for level {level_id}: {text[:200]}")
+        return content[LEVEL_HTML_KEY]
+
+    def get_all_words(
+            self,
+            course_edit_url: str,
+            with_location: bool = False,
+            level_id_list: List[str] = None,
+            ):
+        """Returns all words in the Memrise course, like `get_all_words`.
+
+        The edit page is fetched once, then the tables of its levels concurrently. The
+        column map of the course is cached from the tables (see `cache_column_map`).
+
+        Args:
+            course_edit_url (str): url of the edit page of the course.
+            with_location (bool, optional): whether to add the columns of
+                LOCATION_COL_LIST. Defaults to False.
+            level_id_list (list of str, optional): IDs of the levels to read. Defaults
+                to all the levels.
+
+        Returns:
+            pandas.DataFrame: a dataframe with all words in the Memrise course
+        """
+        tree = lxml_html.fromstring(self.get_html(course_edit_url))
+        # the levels not shown yet, i.e. without their table
+        level_element_list = [
+            level_element for level_element in tree.xpath(LEVEL_XPATH)
+            if (level_id_list is None
+                or level_element.get("data-level-id") in level_id_list)
+            and not level_element.xpath("." + ut.LEVEL_TABLE_XPATH)]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            level_html_list = list(executor.map(
+                lambda level_element: self.get_level_html(
+                    course_edit_url, level_element.get("data-level-id")),
+                level_element_list))
+        # put the tables in their levels, as if the browser showed them
+        for level_element, level_html in zip(level_element_list, level_html_list):
+            for table_element in lxml_html.fromstring(level_html).xpath(
+                    ut.LEVEL_TABLE_XPATH):
+                table_element.set("data-level-id", level_element.get("data-level-id"))
+                wrapper_element = lxml_html.Element("div")
+                wrapper_element.append(table_element)
+                level_element.append(wrapper_element)
+        page_df = ut.page_source_to_df(tree, level_id_list)
+        if page_df is None:
+            raise MinNumberOfLevels()
+        ut.cache_column_map(course_edit_url, tree, self.column_map_path)
+
+        return ut.format_words_df(page_df, with_location)
+
+    def get_all_words_from_db(self, course_db_url: str, course_edit_url: str = None):
+        """Returns all words in the database of the Memrise course.
+
+        The database lists every word in a few flat pages, so no level is shown. The
+        first page gives the number of pages, then the others are fetched
+        concurrently.
+
+        Args:
+            course_db_url (str): url of the database page of the course.
+            course_edit_url (str, optional): url of the edit page of the course, to find
+                the cells with its cached column map (see `load_column_map`). Defaults
+                to the header of the database page.
+
+        Returns:
+            pandas.DataFrame: a dataframe with all words in the database, with the
+            columns of COL_LIST.
+
+        Raises:
+            NotDatabasePage: if the page has no table of words, e.g. when the user is
+                not signed in.
+        """
+        first_tree = lxml_html.fromstring(self.get_html(course_db_url))
+        column_predicate_dict = None
+        if course_edit_url is not None:
+            column_predicate_dict = ut.load_column_map(
+                course_edit_url, self.column_map_path)
+        if column_predicate_dict is None or not first_tree.xpath(
+                f"//tr[@class='thing']/td[{column_predicate_dict.get('cell id')}]"):
+            # not cached, or the columns changed since they were cached
+            thead_list = first_tree.xpath("//thead[@class='columns']")
+            if thead_list:
+                column_predicate_dict = ut.thead_to_xpath_predicate(thead_list[0])
+            if not thead_list or "cell id" not in column_predicate_dict:
+                # e.g. the sign in page, after the cookies expired
+                raise NotDatabasePage(course_db_url)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            tree_list = [first_tree] + list(executor.map(
+                lambda page: lxml_html.fromstring(
+                    self.get_html(course_db_url, {"page": page})),
+                range(2, ut.db_page_count(first_tree) + 1)))
+        row_dict_list = [row_dict for tree in tree_list
+                         for row_dict in ut.db_page_rows(tree, column_predicate_dict)]
+
+        return ut.format_words_df(ut.values_to_df(COL_LIST, row_dict_list))
@@ -1,19 +1,26 @@
 """Utility functions to help control Memrise account and course."""
 
-from io import StringIO
+import json
+import os
+import re
+from typing import List, Union
+import numpy as np
 import pandas as pd
-from bs4 import BeautifulSoup as bs
-from selenium.common.exceptions import NoSuchElementException
+from lxml import html as lxml_html
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 from selenium.webdriver import Firefox, Remote
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.remote.webelement import WebElement
 
 from src.memrise import constants as cont
 from src.constants import (
-    COL_LIST, NOT_NULL_COL_LIST)
+    COL_LIST, LOCATION_COL_LIST, NOT_NULL_COL_LIST)
+
+COLUMN_MAP_PATH = "state/column_map.json"
+# maps the urls of the courses to their column maps, see cell_col_to_xpath_predicate
+_column_map_dict = {}
 
 
 def create_driver(headless=True):
@@ -112,7 +119,7 @@ def validate_input(word_df):
 
     return df_valid
 
-def show_all_level_tables(driver: Remote):
+def show_all_level_tables(driver: Remote, one_shot: bool = True):
     """Show all level tables in the edit page.
 
     Note: The admin user must be logged in the passed driver.
@@ -121,10 +128,29 @@ def show_all_level_tables(driver: Remote):
 
     Args:
         driver (selenium.webdriver.Remote): a selenium webdriver
+        one_shot (bool, optional): whether to click every show button with one script
+            and wait once for all the tables, instead of clicking the buttons one by
+            one and waiting for each table. If the tables don't all appear within
+            TIMEOUT_LIMIT plus LEVEL_SHOW_TIME per folded level, the remaining levels
+            are shown one by one. Defaults to True.
 
     Returns:
         selenium.webdriver.Remote: the passed driver after showing all level tables
     """
+    if one_shot:
+        n_folded_levels = len(driver.find_elements_by_xpath(
+            "//div[@class='level collapsed']"))
+        previous_script_timeout = _get_script_timeout(driver)
+        driver.set_script_timeout(
+            cont.TIMEOUT_LIMIT + n_folded_levels * cont.LEVEL_SHOW_TIME)
+        try:
+            driver.execute_async_script(cont.SHOW_ALL_LEVELS_JAVA_SCRIPT)
+            return driver
+        except TimeoutException:
+            # stop watching the page, the levels left are shown one by one
+            driver.execute_script(cont.DISCONNECT_SHOW_ALL_LEVELS_JAVA_SCRIPT)
+        finally:
+            driver.set_script_timeout(previous_script_timeout)
     # every time I click show the page change its source and the element in the list
     # becomes stale, so I check for valid show buttons each time.
     driver, show_btn_list = _get_show_btns_for_folded_levels(driver)
@@ -144,6 +170,53 @@ def show_all_level_tables(driver: Remote):
             all_shown = True
     return driver
 
+def _get_script_timeout(driver: Remote):
+    # the script timeout of the driver in seconds, Selenium 3 can't read it back
+    try:
+        return driver.timeouts.script
+    except AttributeError:
+        return cont.DEFAULT_SCRIPT_TIMEOUT
+
+def show_level_tables(driver: Remote, level_id_list: List[str]):
+    """Show the tables of some levels in the edit page.
+
+    Note: The admin user must be logged in the passed driver.
+
+    The driver must be in the course edit page. Only the passed levels are expanded,
+    instead of every level of the course as `show_all_level_tables` does. If one of
+    them is not found, e.g. it was deleted by hand, all the levels are shown instead.
+
+    Args:
+        driver (selenium.webdriver.Remote): a selenium webdriver
+        level_id_list (list of str): IDs of the levels to show.
+
+    Returns:
+        selenium.webdriver.Remote: the passed driver after showing the level tables
+    """
+    for level_id in level_id_list:
+        try:
+            level_element = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
+                EC.presence_of_element_located(
+                    (By.XPATH,
+                     f"//div[contains(@class, 'level') and @data-level-id='{level_id}']")))
+        except TimeoutException:
+            print(f"Level {level_id} not found, showing all the levels.")
+            return show_all_level_tables(driver)
+        try:  # level is shown
+            level_element.find_element_by_xpath(
+                ".//table[@class='level-things table ui-sortable']")
+            continue
+        except NoSuchElementException:
+            pass
+        show_btn = level_element.find_element_by_xpath(
+            ".//a[@class='show-hide btn btn-small']")
+        driver.execute_script("arguments[0].click();", show_btn)
+        # wait until the table appears
+        WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
+            EC.presence_of_element_located(
+                (By.XPATH, f"//table[@data-level-id='{level_id}']")))
+    return driver
+
 def _get_show_btns_for_folded_levels(driver):
     # all show buttons
     show_btn_list = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
@@ -161,74 +234,317 @@ def _get_show_btns_for_folded_levels(driver):
     
     return driver, valid_show_btn_list
 
-def cell_col_to_xpath_predicate(driver: Remote, course_edit_url: str):
+def thead_to_xpath_predicate(thead_element):
+    """Returns a dictionary of column names and their xpath predicates.
+
+    Args:
+        thead_element (lxml.html.HtmlElement): the thead element with class="columns"
+            of a level table.
+
+    Returns:
+        dict: a dictionary of column names and the xpath predicates of their cells
+    """
+    column_predicate_dict = {}
+    for th in thead_element.iter("th"):
+        span_list = th.findall(".//span")
+        column_name = span_list[0].text_content() if span_list else ""
+        class_list = th.get("class", "").split()
+        # column class is column text or attribute text
+        # while cell class if cell text column or cell text attribute
+        class_name = " ".join(class_list[-1::-1]) if class_list else ""
+        class_name = "cell "+class_name if class_name else ""
+        data_key = th.get("data-key", "")
+        xpath_predicate = f"@class='{class_name}' and @data-key='{data_key}'"
+        column_predicate_dict[column_name] = xpath_predicate
+
+    return column_predicate_dict
+
+
+def _load_column_map_dict(path: str):
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_column_map(course_edit_url: str, column_predicate_dict: dict, path: str):
+    _column_map_dict[course_edit_url] = column_predicate_dict
+    if path is None:
+        return
+    column_map_dict = _load_column_map_dict(path)
+    column_map_dict[course_edit_url] = column_predicate_dict
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(column_map_dict, f, indent=4)
+
+
+def invalidate_column_map(course_edit_url: str, path: str = COLUMN_MAP_PATH):
+    """Drops the cached column map of a course, e.g. when one of its columns is missed.
+
+    Args:
+        course_edit_url (str): url of the edit page of the course.
+        path (str, optional): path of the JSON file of the column maps, None to only
+            use the memory. Defaults to COLUMN_MAP_PATH.
+    """
+    _column_map_dict.pop(course_edit_url, None)
+    column_map_dict = _load_column_map_dict(path)
+    if column_map_dict.pop(course_edit_url, None) is not None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(column_map_dict, f, indent=4)
+
+
+def load_column_map(course_edit_url: str, path: str = COLUMN_MAP_PATH):
+    """Returns the cached column map of a course.
+
+    Args:
+        course_edit_url (str): url of the edit page of the course.
+        path (str, optional): path of the JSON file of the column maps, None to only
+            use the memory. Defaults to COLUMN_MAP_PATH.
+
+    Returns:
+        dict: the column map, see `cell_col_to_xpath_predicate`. None if it isn't
+        cached.
+    """
+    if course_edit_url not in _column_map_dict:
+        column_predicate_dict = _load_column_map_dict(path).get(course_edit_url)
+        if column_predicate_dict is not None:
+            _column_map_dict[course_edit_url] = column_predicate_dict
+    return _column_map_dict.get(course_edit_url)
+
+
+def cache_column_map(
+        course_edit_url: str,
+        page_source: Union[str, lxml_html.HtmlElement],
+        path: str = COLUMN_MAP_PATH,
+        ):
+    """Caches the column map of a course from the source of its edit page.
+
+    Nothing is cached if no level table is shown in the page.
+
+    Args:
+        course_edit_url (str): url of the edit page of the course.
+        page_source (str or lxml.html.HtmlElement): source of the edit page, i.e.
+            `driver.page_source`, or its parsed tree.
+        path (str, optional): path of the JSON file of the column maps, None to only
+            use the memory. Defaults to COLUMN_MAP_PATH.
+    """
+    tree = (lxml_html.fromstring(page_source) if isinstance(page_source, str)
+            else page_source)
+    thead_list = tree.xpath("//thead[@class='columns']")
+    if thead_list:
+        _save_column_map(
+            course_edit_url, thead_to_xpath_predicate(thead_list[0]), path)
+
+
+def cell_col_to_xpath_predicate(
+        driver: Remote,
+        course_edit_url: str,
+        path: str = COLUMN_MAP_PATH,
+        ):
     """Returns a dictionary of column names and their xpath predicates.
 
     Note: The admin user must be logged in the passed driver.
 
+    The map of each course is cached in memory and in the file at `path`, so the edit
+    page is only read the first time, or after `invalidate_column_map`. The columns are
+    the same in every level, so only the first level is shown then.
+
     Args:
         driver (selenium.webdriver.Remote): a selenium webdriver.
         course_edit_url (str): url of the edit page of the course.
+        path (str, optional): path of the JSON file of the column maps, None to only
+            use the memory. Defaults to COLUMN_MAP_PATH.
 
     Returns:
-        selenium.webdriver.Remote: the passed driver after showing all level tables
+        selenium.webdriver.Remote: the passed driver, in the edit page with the first
+        level table shown if the map wasn't cached
         dict: a dictionary of column names and their xpath predicates
     """
-    driver.get(course_edit_url)
-    driver = show_all_level_tables(driver)
+    column_predicate_dict = load_column_map(course_edit_url, path)
+    if column_predicate_dict is not None:
+        return driver, column_predicate_dict
+
+    if driver.current_url.rstrip("/") != course_edit_url.rstrip("/"):
+        driver.get(course_edit_url)
+    first_level_element = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
+        EC.presence_of_element_located(
+            (By.XPATH, "//div[contains(@class, 'level') and @data-level-id]")))
+    driver = show_level_tables(
+        driver, [first_level_element.get_attribute("data-level-id")])
     # on thead element with class="columns"
     thead_element = WebDriverWait(driver, cont.TIMEOUT_LIMIT).until(
         EC.presence_of_element_located(
             (By.XPATH, "//thead[@class='columns']")))
-    thead_html = thead_element.get_attribute('outerHTML')
-    soup = bs(thead_html, 'html.parser')
-    column_predicate_dict = {}
-    for th in soup.find_all('th'):
-        span = th.find('span')
-        column_name = span.text if span else ""
-        class_list = th.get("class") if th.get("class") else []
-        # column class is column text or attribute text
-        # while cell class if cell text column or cell text attribute
-        class_name = " ".join(class_list[-1::-1]) if class_list else ""
-        class_name = "cell "+class_name if class_name else ""
-        data_key = th.get("data-key") if th.get("data-key") else ""
-        xpath_predicate = f"@class='{class_name}' and @data-key='{data_key}'"
-        column_predicate_dict[column_name] = xpath_predicate
+    column_predicate_dict = thead_to_xpath_predicate(
+        lxml_html.fromstring(thead_element.get_attribute('outerHTML')))
+    _save_column_map(course_edit_url, column_predicate_dict, path)
 
     return driver, column_predicate_dict
 
 
+WHITESPACE_PATTERN = re.compile(r"\s+")
+DB_PAGE_PATTERN = re.compile(r"[?&]page=(\d+)")
+LEVEL_TABLE_XPATH = "//table[@class='level-things table ui-sortable']"
+
+
+def _cell_text(element):
+    # the text of a cell without its buttons, with its whitespace collapsed like
+    # pd.read_html does
+    text = "".join(element.xpath(".//text()[not(ancestor::button)]"))
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
 
-def table_element_to_df(table_element: WebElement):
-    """Returns a dataframe from a table element.
+def page_source_to_df(
+        page_source: Union[str, lxml_html.HtmlElement],
+        level_id_list: List[str] = None,
+        ):
+    """Returns the words of the level tables shown in the source of the edit page.
+
+    The whole page is parsed once with lxml, instead of reading the html of each
+    table and the name of its level from the browser.
+
+    Args:
+        page_source (str or lxml.html.HtmlElement): source of the edit page, i.e.
+            `driver.page_source`, or its parsed tree.
+        level_id_list (list of str, optional): IDs of the levels to read. Defaults to
+            all the levels shown.
+
+    Returns:
+        pandas.DataFrame: one row per word, with the columns of the tables, "level",
+        i.e. "{level handle}-{level name}", and the columns of LOCATION_COL_LIST. The
+        values are parsed like `pd.read_html` does. None if no level table is shown.
+    """
+    tree = (lxml_html.fromstring(page_source) if isinstance(page_source, str)
+            else page_source)
+    table_list = tree.xpath(LEVEL_TABLE_XPATH)
+    if not table_list:
+        return None
+    col_list = []
+    row_list = []
+    for table_element in table_list:
+        level_id = table_element.get("data-level-id")
+        if level_id_list is not None and level_id not in level_id_list:
+            continue
+        level_element = table_element.getparent().getparent()
+        level_name = "-".join(_cell_text(element) for element in level_element.xpath(
+            ".//div[@class='level-handle'] | .//h3[@class='level-name']"))
+        # the first column is for the actions
+        header_list = [_cell_text(th) for th in table_element.xpath("./thead[1]/tr[1]/th")]
+        for col in header_list:
+            if col and col not in col_list:
+                col_list.append(col)
+        # second and third tbody are for something else
+        for position, tr in enumerate(table_element.xpath("./tbody[1]/tr")):
+            row_dict = {col: _cell_text(td)
+                        for col, td in zip(header_list, tr.xpath("./td")) if col}
+            row_list.append(
+                (row_dict, level_name, level_id, tr.get("data-thing-id"), position))
+    word_df = values_to_df(col_list, [row_dict for row_dict, *_ in row_list])
+    for i, col in enumerate(["level", "level id", "thing id", "position"], start=1):
+        word_df[col] = [row[i] for row in row_list]
+
+    return word_df
+
+
+def values_to_df(col_list: List[str], row_dict_list: List[dict]):
+    """Returns a dataframe of the texts of table cells, parsed like `pd.read_html` does.
+
+    Unlike `pd.read_html`, only the empty cells are missing values: texts such as
+    "NA" or "null" are kept as they are.
+
+    Args:
+        col_list (list of str): the columns.
+        row_dict_list (list of dict): the rows, mapping the columns to the texts of
+            their cells. A missing column is an empty cell.
+
+    Returns:
+        pandas.DataFrame: one row per row dict, with numbers parsed and empty cells as
+        NaN.
+    """
+    value_df = pd.DataFrame(
+        [[row_dict.get(col, "") for col in col_list] for row_dict in row_dict_list],
+        columns=col_list).replace("", np.nan)
+    for col in value_df.columns:
+        try:  # a column of numbers, or only empty cells
+            value_df[col] = pd.to_numeric(value_df[col])
+        except (ValueError, TypeError):
+            pass  # a column of texts
+
+    return value_df
+
+
+def db_page_count(page_source: Union[str, lxml_html.HtmlElement]):
+    """Returns the number of pages of the course database.
+
+    Args:
+        page_source (str or lxml.html.HtmlElement): source of any page of the database,
+            or its parsed tree.
+
+    Returns:
+        int: the highest page linked in the pagination, 1 if there is none.
+    """
+    tree = (lxml_html.fromstring(page_source) if isinstance(page_source, str)
+            else page_source)
+    page_list = []
+    for href in tree.xpath("//ul[contains(@class, 'pagination')]//a/@href"):
+        match = DB_PAGE_PATTERN.search(href)
+        if match:
+            page_list.append(int(match.group(1)))
+    return max(page_list, default=1)
+
+
+def db_page_rows(
+        page_source: Union[str, lxml_html.HtmlElement],
+        column_predicate_dict: dict,
+        ):
+    """Returns the texts of the cells of the words in a page of the course database.
+
+    Args:
+        page_source (str or lxml.html.HtmlElement): source of the page, or its parsed
+            tree.
+        column_predicate_dict (dict): the column map of the course, see
+            `cell_col_to_xpath_predicate`.
+
+    Returns:
+        list of dict: one dict per word, mapping the columns of COL_LIST to the texts of
+        their cells.
+    """
+    tree = (lxml_html.fromstring(page_source) if isinstance(page_source, str)
+            else page_source)
+    predicate_list = [(col, column_predicate_dict[col]) for col in COL_LIST
+                      if col in column_predicate_dict]
+    row_dict_list = []
+    for tr in tree.xpath("//tr[@class='thing']"):
+        row_dict = {}
+        for col, xpath_predicate in predicate_list:
+            td_list = tr.xpath(f"./td[{xpath_predicate}]")
+            if td_list:
+                row_dict[col] = _cell_text(td_list[0])
+        row_dict_list.append(row_dict)
+    return row_dict_list
+
+
+def format_words_df(page_df: pd.DataFrame, with_location: bool = False):
+    """Returns the words of `page_source_to_df` like `get_all_words` does.
 
     Args:
-        table_element (selenium.webdriver.remote.webelement.WebElement): a table element
+        page_df (pandas.DataFrame): the words of the level tables.
+        with_location (bool, optional): whether to keep the columns of
+            LOCATION_COL_LIST. Defaults to False.
 
     Returns:
-        pandas.DataFrame: a dataframe of the table element
+        pandas.DataFrame: the words with the columns of COL_LIST, and LOCATION_COL_LIST
+        if `with_location`, "date modified" parsed as dates and the columns without
+        any value as floats.
     """
-    table_html = table_element.get_attribute('outerHTML')
-    soup = bs(table_html, 'html.parser')
-
-    # Extract the thead and the first tbody
-    # second and third tbody are for something else
-    thead = soup.find('thead')
-    first_tbody = soup.find('tbody')
-
-    # Create a new table with the thead and the first tbody
-    new_table = soup.new_tag('table')
-    new_table.append(thead)
-    new_table.append(first_tbody)
-    # remove any button
-    # ?: is there a simpler way to keep only text from each cell?
-    for button in new_table.find_all('button'):
-        button.decompose()
-
-    table_io = StringIO(str(new_table))
-    table_df = pd.read_html(table_io)[0]
-
-    return table_df
+    col_list = COL_LIST + LOCATION_COL_LIST if with_location else COL_LIST
+    words_df = page_df.reindex(columns=col_list)
+    # check dtypes and columns order and index
+    columns_with_all_na = words_df.columns[words_df.isna().all()]
+    words_df = words_df.astype({col: np.float64 for col in columns_with_all_na})
+    words_df["date modified"] = pd.to_datetime(words_df["date modified"])
+
+    return words_df.reset_index(drop=True)
 
 
 def count_level_words(driver, level_id: str):
@@ -1,103 +1,777 @@
 """This module contains functions to get data from Notion via API.
 
-I will get all data from notion every time to check if there is any deletion
-done on notion and consequently make the changes in memrise.
+By default, I get all data from notion every time to check if there is any
+deletion done on notion and consequently make the changes in memrise.
+
+In incremental mode, only the entries edited since the last run (the watermark)
+are fetched, and deletions are found with a separate pass that fetches the IDs of
+the entries only.
 """
 
+import json
 import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from queue import Full, Queue
+from urllib.parse import unquote
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import numpy as np
 # ? the right way to import from constants ?
-from src.constants import COL_LIST
+from src.constants import CATEGORY_COL_LIST, COL_LIST
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = "string[pyarrow]"
+except ImportError:  # pyarrow is optional
+    STRING_DTYPE = "string[python]"
 
 NOTION_SECRET = os.environ.get("NOTION_SECRET")
 NOTION_VERSION = "2022-06-28"  # Notion API version from their website
+NOTION_API_URL = "https://api.notion.com/v1"
+PAGE_SIZE = 100  # maximum allowed by the API
+TIMEOUT = 10  # in seconds
+RATE_LIMIT = 3  # average number of requests per second allowed by the API
+MAX_RETRIES = 5  # retries of a request that was throttled or failed on the server
+BACKOFF_BASE = 1  # in seconds, doubled after every retry
+RETRY_STATUS_CODE_LIST = [429, 500, 502, 503, 504]
 
 HEADERS = {
     "Authorization": f"Bearer {NOTION_SECRET}",
-    "Notion-Version": "2022-06-28",
+    "Notion-Version": NOTION_VERSION,
     "Content-Type": "application/json",
 }
 # a list in case I add more date columns
 DATE_COL_LIST = ["date modified"]  # only used here and in testing
+# the most recent "date modified" synced from each database
+WATERMARK_PATH = "state/notion_watermark.json"
+# the flattened rows of the pages, see PageCache
+CACHE_PATH = "state/notion_cache.sqlite"
+# the ID of the title property is always "title"
+TITLE_PROPERTY_ID = "title"
+# column made from the ID of the page, not from a property
+PAGE_ID_COL = "cell id"
+COL_SET = set(COL_LIST)
+# columns whose text is not normalized, they never contain line breaks or spaces
+RAW_COL_LIST = [PAGE_ID_COL] + DATE_COL_LIST
+# number of pages fetched ahead while the current one is parsed
+MAX_PREFETCH = 2
+# literal "\\n" sequences and runs of whitespace
+LINE_BREAK_PATTERN = re.compile(r"\\n+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+class TokenBucket:
+    """Token bucket limiting the rate of requests, safe to share between threads.
+
+    Args:
+        rate (float, optional): tokens added per second. Defaults to RATE_LIMIT.
+        capacity (float, optional): maximum number of tokens, i.e. the size of a
+            burst. Defaults to `rate`.
+    """
+
+    def __init__(self, rate: float = RATE_LIMIT, capacity: float = None):
+        self.rate = rate
+        self.capacity = rate if capacity is None else capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes one token, waiting until one is available.
+
+        Returns:
+            float: time waited in seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            # a negative balance is the wait of the threads queued before this one
+            wait = max(0, -self._tokens / self.rate)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# shared by all clients, so that syncing several databases at once stays under the
+# rate limit of the integration
+SHARED_RATE_LIMITER = TokenBucket()
+
+
+class NotionClient:
+    """Client of the Notion API that keeps its connections alive between requests.
+
+    Every request goes through the same pooled `requests.Session`, so pages of a
+    query after the first one don't pay for a new TLS handshake.
+
+    Requests wait for the rate limiter before they are sent. Requests throttled by
+    Notion (429) or failed on its side (5xx, connection errors) are retried with a
+    jittered exponential backoff, or after the delay in the Retry-After header. A
+    query that fails on a page resumes from the cursor of that page.
+
+    Args:
+        session (requests.Session, optional): session to send the requests with.
+            Defaults to a new session with a connection pool of `pool_size`.
+        pool_size (int, optional): number of connections kept alive. Defaults to 4.
+        rate_limiter (TokenBucket, optional): limiter of the requests. Defaults to
+            SHARED_RATE_LIMITER.
+        max_retries (int, optional): retries of a request. Defaults to MAX_RETRIES.
+
+    Attributes:
+        n_requests (int): number of requests sent.
+        n_retries (int): number of requests retried.
+        throttled_time (float): time in seconds spent waiting for the rate limiter
+            and before retries.
+    """
+
+    def __init__(self, session=None, pool_size=4, rate_limiter=SHARED_RATE_LIMITER,
+                 max_retries=MAX_RETRIES):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+        session.headers.update(HEADERS)
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.n_requests = 0
+        self.n_retries = 0
+        self.throttled_time = 0.0
+        self._schema_dict = {}  # schema of the COL_LIST properties of each database
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the connections of the session."""
+        self.session.close()
+
+    def request(self, method: str, url: str, **kwargs):
+        """Sends a request to the Notion API, within the rate limit and with retries.
+
+        Args:
+            method (str): HTTP method, e.g. "POST".
+            url (str): url of the endpoint.
+            **kwargs: passed to `requests.Session.request`.
+
+        Returns:
+            dict: the decoded response.
+
+        Raises:
+            requests.HTTPError: if the request failed after all the retries, or
+                failed with an error that is not worth retrying (e.g. 400).
+        """
+        for attempt in range(self.max_retries + 1):
+            self.throttled_time += self.rate_limiter.acquire()
+            self.n_requests += 1
+            try:
+                response = self.session.request(method, url, timeout=TIMEOUT, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                delay = _backoff_delay(attempt)
+            else:
+                if (response.status_code not in RETRY_STATUS_CODE_LIST
+                        or attempt == self.max_retries):
+                    response.raise_for_status()
+                    return response.json()
+                delay = _retry_after(response)
+                if delay is None:
+                    delay = _backoff_delay(attempt)
+            self.n_retries += 1
+            self.throttled_time += delay
+            time.sleep(delay)
+
+    def get_database(self, notion_db_id: str):
+        """Gets a Notion database, including the schema of its properties.
+
+        Args:
+            notion_db_id (str): ID of the Notion database.
+
+        Returns:
+            dict: the decoded database object. Its "properties" key maps the name of
+            each property to its ID and type.
+        """
+        return self.request("GET", f"{NOTION_API_URL}/databases/{notion_db_id}")
+
+    def get_schema(self, notion_db_id: str):
+        """Gets the schema of the properties in COL_LIST.
+
+        The database is only fetched the first time for each database.
+
+        Args:
+            notion_db_id (str): ID of the Notion database.
+
+        Returns:
+            dict: maps the name of each property in COL_LIST to its "id" and "type".
+
+        Raises:
+            ValueError: if a column of COL_LIST is not a property of the database.
+        """
+        if notion_db_id not in self._schema_dict:
+            schema_dict = self.get_database(notion_db_id)["properties"]
+            missing_col_list = [col for col in COL_LIST
+                                if col != PAGE_ID_COL and col not in schema_dict]
+            if missing_col_list:
+                raise ValueError(
+                    f"Columns not found in the Notion database: {missing_col_list}")
+            self._schema_dict[notion_db_id] = {
+                col: schema_dict[col] for col in COL_LIST if col != PAGE_ID_COL}
+        return self._schema_dict[notion_db_id]
+
+    def get_property_ids(self, notion_db_id: str):
+        """Gets the IDs of the properties in COL_LIST from the database schema.
+
+        Args:
+            notion_db_id (str): ID of the Notion database.
+
+        Returns:
+            list: IDs of the properties, in the order of COL_LIST.
+        """
+        return [prop["id"] for prop in self.get_schema(notion_db_id).values()]
+
+    def query_database(
+            self,
+            notion_db_id: str,
+            start_cursor=None,
+            filter_dict=None,
+            filter_properties=None,
+            ):
+        """Queries one page of results of a Notion database.
+
+        Args:
+            notion_db_id (str): ID of the Notion database.
+            start_cursor (str, optional): cursor returned by the previous page.
+            filter_dict (dict, optional): filter of the query, in the format of the
+                Notion API.
+            filter_properties (list, optional): IDs of the only properties to
+                return for each page, as returned by `get_property_ids`. Defaults to
+                all properties.
+
+        Returns:
+            dict: the decoded response, with the keys "results", "has_more" and
+            "next_cursor".
+        """
+        body = {"page_size": PAGE_SIZE}
+        if start_cursor is not None:
+            body["start_cursor"] = start_cursor
+        if filter_dict is not None:
+            body["filter"] = filter_dict
+        params = None
+        if filter_properties:
+            # the IDs are already URL-encoded, e.g. "%3AUPp", and requests encodes them
+            params = {"filter_properties": [unquote(property_id)
+                                            for property_id in filter_properties]}
+        return self.request(
+            "POST",
+            f"{NOTION_API_URL}/databases/{notion_db_id}/query",
+            params=params,
+            json=body,
+        )
+
+    def iter_query(self, notion_db_id: str, filter_dict=None, filter_properties=None,
+                   start_cursor=None):
+        """Yields every page of results of a Notion database, following the cursors.
+
+        Args:
+            notion_db_id (str): ID of the Notion database.
+            filter_dict (dict, optional): filter of the query.
+            filter_properties (list, optional): IDs of the only properties to
+                return for each page.
+            start_cursor (str, optional): "next_cursor" of the last page received, to
+                resume a query that failed. Defaults to the first page.
+
+        Yields:
+            dict: the decoded response of each page.
+
+        Raises:
+            requests.RequestException: if a page failed after all the retries. Its
+                `start_cursor` attribute is the cursor of that page, to resume the
+                query from it.
+        """
+        cursor = start_cursor
+        while True:
+            try:
+                response_dict = self.query_database(
+                    notion_db_id, cursor, filter_dict, filter_properties)
+            except requests.RequestException as e:
+                e.start_cursor = cursor
+                raise
+            yield response_dict
+            if not response_dict["has_more"]:
+                return
+            cursor = response_dict["next_cursor"]
+
+
+def _backoff_delay(attempt: int):
+    # exponential backoff with jitter, so throttled clients don't retry together
+    return BACKOFF_BASE * 2 ** attempt * random.uniform(0.5, 1.5)
+
+
+def _retry_after(response):
+    # delay in seconds asked by the API, if any
+    try:
+        return float(response.headers["Retry-After"])
+    except (KeyError, TypeError, ValueError):
+        return None
 
-def get_data_from_notion(notion_db_id: str):
+
+def prefetch(iterable, max_prefetch: int = MAX_PREFETCH):
+    """Iterates over an iterable in a background thread, ahead of the consumer.
+
+    It is used to request the next page of a query while the current one is being
+    parsed. At most `max_prefetch` items wait in the queue, so memory stays flat.
+    Exceptions raised by the iterable are raised again in the consumer.
+
+    Args:
+        iterable (iterable): e.g. `NotionClient.iter_query(...)`.
+        max_prefetch (int, optional): size of the queue. Defaults to MAX_PREFETCH.
+
+    Yields:
+        the items of the iterable, in the same order.
+    """
+    queue = Queue(maxsize=max_prefetch)
+    stop_event = threading.Event()
+    done = object()  # marks the end of the iterable
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except Exception as e:  # raised in the consumer
+            put((done, e))
+            return
+        put((done, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:  # also when the consumer stops early
+        stop_event.set()
+        thread.join()
+
+
+def get_data_from_notion(
+        notion_db_id: str,
+        client=None,
+        edited_since=None,
+        max_prefetch: int = MAX_PREFETCH,
+        cache=None,
+        start_cursor: str = None,
+        ):
     """Gets and processes data from Notion via API.
 
+    Only the properties in COL_LIST are requested. The next page of results is
+    requested in the background while the current one is parsed (see `prefetch`).
+    The properties of every page are flattened into a list of records and the
+    dataframe is built once at the end, instead of concatenating a new dataframe for
+    every page of results.
+
     Args:
         notion_db_id (str): ID of the Notion database.
+        client (NotionClient, optional): client to query the database with.
+            Defaults to a new client that is closed at the end.
+        edited_since (pandas.Timestamp, optional): if passed, only the entries
+            edited on or after it are fetched (filtered by Notion). Defaults to all
+            entries.
+        max_prefetch (int, optional): number of pages fetched ahead. 0 fetches the
+            pages in the same thread. Defaults to MAX_PREFETCH.
+        cache (PageCache, optional): if passed, the rows of the pages that were not
+            edited since they were cached are reused, and the fetched rows are
+            cached. Defaults to no cache.
+        start_cursor (str, optional): cursor to resume a query that failed from, i.e.
+            the `start_cursor` attribute of the raised error. Only the entries from
+            that page on are returned. The entries received before the error are kept
+            in the cache, if any. Defaults to the first page.
 
     Returns:
         pandas.DataFrame: dataframe of the entries in the Notion database.
+
+    Raises:
+        requests.RequestException: if a page failed after all the retries, with the
+            cursor to resume from as its `start_cursor` attribute.
     """
-    endpoint = f"https://api.notion.com/v1/databases/{notion_db_id}/query"
-    response = requests.post(
-        endpoint,
-        headers=HEADERS,
-        timeout=10,
-    )
-    df_clean = handle_response(response)
-    has_more = response.json()["has_more"]
-    while has_more:
-        next_cursor = response.json()["next_cursor"]
-        response = requests.post(
-            endpoint,
-            headers=HEADERS,
-            timeout=10,
-            json={
-                "start_cursor": next_cursor
-            },
-        )
-        df_clean = pd.concat([df_clean, handle_response(response)])
-        has_more = response.json()["has_more"]
-    return df_clean
+    filter_dict = None
+    if edited_since is not None:
+        filter_dict = {
+            "timestamp": "last_edited_time",
+            "last_edited_time": {"on_or_after": edited_since.isoformat()},
+        }
+    own_client = client is None
+    client = NotionClient() if own_client else client
+    record_list = []
+    cache_entry_list = []
+    try:
+        property_id_list = client.get_property_ids(notion_db_id)
+        extractor_tuple = compile_extractors(client.get_schema(notion_db_id))
+        cached_row_dict = cache.load(notion_db_id) if cache is not None else None
+        response_iter = client.iter_query(
+            notion_db_id, filter_dict, property_id_list, start_cursor)
+        if max_prefetch > 0:
+            response_iter = prefetch(response_iter, max_prefetch)
+        for response_dict in response_iter:
+            results_list = response_dict["results"]
+            row_list = handle_results(results_list, extractor_tuple, cached_row_dict)
+            record_list.extend(row_list)
+            if cache is not None:
+                cache_entry_list.extend(
+                    (page["id"], page.get("last_edited_time"), row)
+                    for page, row in zip(results_list, row_list))
+    except requests.RequestException:
+        if cache is not None and cache_entry_list:
+            # the pages received are not fetched again when the query resumes
+            cache.save(notion_db_id, cache_entry_list)
+        raise
+    finally:
+        if own_client:
+            client.close()
+    if cache is not None:
+        # a full fetch also removes the pages deleted from Notion
+        cache.save(notion_db_id, cache_entry_list,
+                   replace=edited_since is None and start_cursor is None)
+    return records_to_df(record_list)
+
+
+def get_data_from_cache(notion_db_id: str, cache):
+    """Rebuilds the dataframe of a Notion database from the cache, without network.
+
+    Args:
+        notion_db_id (str): ID of the Notion database.
+        cache (PageCache): cache filled by `get_data_from_notion`.
+
+    Returns:
+        pandas.DataFrame: dataframe of the cached entries of the Notion database.
+    """
+    return records_to_df([row for _, row in cache.load(notion_db_id).values()])
+
+
+def get_page_ids_from_notion(notion_db_id: str, client=None):
+    """Gets the IDs of all the entries in a Notion database.
+
+    Only the title property is requested, so the pages are much lighter than in
+    `get_data_from_notion`. It is used to find the entries deleted from Notion
+    when only the edited entries are fetched.
+
+    Args:
+        notion_db_id (str): ID of the Notion database.
+        client (NotionClient, optional): client to query the database with.
+            Defaults to a new client that is closed at the end.
+
+    Returns:
+        list: IDs of the entries, which are the cell ids on Memrise.
+    """
+    own_client = client is None
+    client = NotionClient() if own_client else client
+    try:
+        return [
+            page["id"]
+            for response_dict in client.iter_query(
+                notion_db_id, filter_properties=[TITLE_PROPERTY_ID])
+            for page in response_dict["results"]
+        ]
+    finally:
+        if own_client:
+            client.close()
+
+
+class PageCache:
+    """On-disk cache of the flattened rows of Notion pages, in SQLite.
+
+    Each row is stored with the ID of its page (the cell id) and the
+    "last_edited_time" of the page when it was fetched. The rows of a database are
+    dropped when COL_LIST changes.
+
+    Args:
+        path (str, optional): path of the SQLite file. Defaults to CACHE_PATH.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS page ("
+                "database_id TEXT, cell_id TEXT, last_edited_time TEXT, row TEXT, "
+                "PRIMARY KEY (database_id, cell_id))")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS col_list ("
+                "database_id TEXT PRIMARY KEY, col_list TEXT)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the connection to the SQLite file."""
+        self.connection.close()
+
+    def load(self, notion_db_id: str):
+        """Loads the cached rows of a Notion database.
+
+        Args:
+            notion_db_id (str): ID of the Notion database.
+
+        Returns:
+            dict: maps the cell id of each page to a tuple of its "last_edited_time"
+            and its row, in the order of COL_LIST.
+        """
+        if not self._is_up_to_date(notion_db_id):
+            return {}
+        cursor = self.connection.execute(
+            "SELECT cell_id, last_edited_time, row FROM page WHERE database_id = ?",
+            (notion_db_id,))
+        return {
+            cell_id: (last_edited_time, tuple(
+                np.nan if value is None else value for value in json.loads(row)))
+            for cell_id, last_edited_time, row in cursor
+        }
+
+    def save(self, notion_db_id: str, entry_list, replace: bool = False):
+        """Caches the rows of pages of a Notion database.
+
+        Args:
+            notion_db_id (str): ID of the Notion database.
+            entry_list (list): tuples of the cell id, "last_edited_time" and row of
+                each page.
+            replace (bool, optional): whether to drop the pages not in `entry_list`.
+                Defaults to False.
+        """
+        with self.connection:  # one transaction
+            if replace or not self._is_up_to_date(notion_db_id):
+                self.connection.execute(
+                    "DELETE FROM page WHERE database_id = ?", (notion_db_id,))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO col_list VALUES (?, ?)",
+                (notion_db_id, json.dumps(COL_LIST)))
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO page VALUES (?, ?, ?, ?)",
+                [(notion_db_id, cell_id, last_edited_time, json.dumps([
+                    None if pd.isna(value) else value for value in row]))
+                 for cell_id, last_edited_time, row in entry_list])
+
+    def _is_up_to_date(self, notion_db_id: str):
+        # whether the rows of the database were cached with the current COL_LIST
+        col_list = self.connection.execute(
+            "SELECT col_list FROM col_list WHERE database_id = ?",
+            (notion_db_id,)).fetchone()
+        return col_list is not None and json.loads(col_list[0]) == COL_LIST
 
+    def keep_only(self, notion_db_id: str, cell_id_list):
+        """Drops the cached pages that are not in `cell_id_list`.
 
+        Args:
+            notion_db_id (str): ID of the Notion database.
+            cell_id_list (list): IDs of all the entries in the Notion database, as
+                returned by `get_page_ids_from_notion`.
+        """
+        cell_id_set = set(cell_id_list)
+        cursor = self.connection.execute(
+            "SELECT cell_id FROM page WHERE database_id = ?", (notion_db_id,))
+        deleted_list = [
+            (notion_db_id, cell_id) for cell_id, in cursor if cell_id not in cell_id_set]
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM page WHERE database_id = ? AND cell_id = ?", deleted_list)
 
 
-def handle_response(response):
+def load_watermark(notion_db_id: str, path: str = WATERMARK_PATH):
+    """Loads the most recent "date modified" synced from a Notion database.
+
+    Args:
+        notion_db_id (str): ID of the Notion database.
+        path (str, optional): path of the watermark file. Defaults to WATERMARK_PATH.
+
+    Returns:
+        pandas.Timestamp: the watermark, or None if the database was never synced.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        watermark_dict = json.load(f)
+    watermark = watermark_dict.get(notion_db_id)
+
+    return pd.Timestamp(watermark) if watermark else None
+
+
+def save_watermark(notion_db_id: str, notion_df: pd.DataFrame, path: str = WATERMARK_PATH):
+    """Saves the most recent "date modified" of the synced entries as the watermark.
+
+    The watermark never goes back, so saving after a run that fetched nothing keeps
+    the previous one.
+
+    Args:
+        notion_db_id (str): ID of the Notion database.
+        notion_df (pandas.DataFrame): dataframe of the synced entries.
+        path (str, optional): path of the watermark file. Defaults to WATERMARK_PATH.
+    """
+    watermark = notion_df["date modified"].max()
+    previous = load_watermark(notion_db_id, path)
+    if pd.isna(watermark) or (previous is not None and previous > watermark):
+        watermark = previous
+    if watermark is None:
+        return
+    watermark_dict = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            watermark_dict = json.load(f)
+    watermark_dict[notion_db_id] = watermark.isoformat()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(watermark_dict, f, indent=4)
+
+
+def handle_response(response_dict):
     """Handles the response from the Notion API.
 
     Args:
-        response (requests.Response): response from the Notion API.
+        response_dict (dict): decoded response from the Notion API, as returned by
+            `NotionClient.query_database`.
 
     Returns:
         pandas.DataFrame: dataframe of the entries in the Notion database.
     """
-    results_list = response.json()["results"]
-    df = pd.DataFrame(results_list)
-    # we only need id and properties
-    df_copy = df[["id", "properties"]]
-    df_copy.loc[:,
-                "properties"] = df_copy["properties"].apply(handle_properties)
-    # add id to properties which will be turned into a new dataframe
-    # also name it cell id
-    df_copy.loc[:, "properties"] = df_copy.apply(lambda row: {
-        "cell id": row["id"],
-        **row["properties"]
-    },
-                                                 axis=1)
-    new_df = pd.DataFrame(df_copy["properties"].tolist())
-    for col in new_df:
-        if np.all(new_df[col].isna()):  # new_df[col].str will throw an error
-            continue
-        # handle the line breakers
-        # if new_df[col].dtype == "object":
-        new_df[col] = new_df[col].str.replace(r"\\n+", "", regex=True)
-        new_df[col] = new_df[col].str.replace(r"\s+", " ", regex=True)
-        new_df[col] = new_df[col].str.strip()
+    return records_to_df(handle_results(response_dict["results"]))
+
+
+def handle_results(results_list, extractor_tuple=None, cached_row_dict=None):
+    """Flattens the pages returned by the Notion API into records.
+
+    Args:
+        results_list (list): pages in the "results" key of a Notion API response.
+        extractor_tuple (tuple, optional): extractors compiled from the database
+            schema by `compile_extractors`. Without them, the type of every property
+            is looked up in every page.
+        cached_row_dict (dict, optional): rows of a previous run, as returned by
+            `PageCache.load`. The row of a page is reused instead of parsed again
+            when its "last_edited_time" didn't change.
+
+    Returns:
+        list: one tuple per page with the content of the columns in COL_LIST, in
+        the same order.
+    """
+    if extractor_tuple is None:
+        extract_row = _extract_row
+    else:
+        def extract_row(page):
+            return tuple([extract(page) for extract in extractor_tuple])
+
+    if not cached_row_dict:
+        return [extract_row(page) for page in results_list]
+    record_list = []
+    for page in results_list:
+        cached = cached_row_dict.get(page["id"])
+        if cached is not None and cached[0] == page.get("last_edited_time"):
+            record_list.append(cached[1])
+        else:
+            record_list.append(extract_row(page))
+    return record_list
+
+
+def _extract_row(page):
+    # we only need id and properties, the id is named cell id
+    prop_dict = {PAGE_ID_COL: page["id"], **handle_properties(page["properties"])}
+    return tuple(
+        prop_dict.get(col, np.nan) if col in RAW_COL_LIST
+        else normalize_text(prop_dict.get(col, np.nan))
+        for col in COL_LIST
+    )
+
+
+def normalize_text(text):
+    """Removes the line breaks and collapses the whitespace of a text in one pass.
+
+    Args:
+        text: content of a property. Anything other than a string is returned as is.
+
+    Returns:
+        the normalized text.
+    """
+    if not isinstance(text, str):
+        return text
+    return WHITESPACE_PATTERN.sub(" ", LINE_BREAK_PATTERN.sub("", text)).strip()
+
+
+def records_to_df(record_list, compact: bool = True):
+    """Builds the cleaned dataframe of the Notion entries from flattened records.
+
+    Args:
+        record_list (list): records as returned by `handle_results`.
+        compact (bool, optional): whether to use the compact dtypes of
+            `to_compact_dtypes` instead of object columns. Defaults to True.
+
+    Returns:
+        pandas.DataFrame: dataframe of the entries in the Notion database.
+    """
+    # the text is already normalized by `handle_results`
+    new_df = pd.DataFrame.from_records(record_list, columns=COL_LIST)
     for col in DATE_COL_LIST:
         new_df[col] = pd.to_datetime(new_df[col])
 
-    return new_df[COL_LIST]
+    return to_compact_dtypes(new_df) if compact else new_df
+
+
+def to_compact_dtypes(notion_df: pd.DataFrame):
+    """Converts the columns of the Notion dataframe to compact dtypes.
+
+    The columns in CATEGORY_COL_LIST become categoricals, and the other text columns,
+    including cell id, become strings backed by pyarrow (or by Python objects if
+    pyarrow is not installed). Missing values become pandas.NA.
+
+    Args:
+        notion_df (pandas.DataFrame): dataframe of the entries in the Notion database.
+
+    Returns:
+        pandas.DataFrame: the dataframe with compact dtypes.
+    """
+    dtype_dict = {}
+    for col in notion_df.columns:
+        if col in DATE_COL_LIST:
+            continue
+        if col in CATEGORY_COL_LIST:
+            dtype_dict[col] = "category"
+        # numbers or booleans from other property types are kept as they are
+        elif (notion_df[col].isna().all()
+              or pd.api.types.infer_dtype(notion_df[col], skipna=True) == "string"):
+            dtype_dict[col] = STRING_DTYPE
+
+    return notion_df.astype(dtype_dict)
 
 
 def handle_properties(properties_dict):
     """Handles the properties of a Notion entry from API.
 
     Properties returned from the API contain a lot of information. We are only
-    interested in the content of the property, not the type or id.
+    interested in the content of the property, not the type or id. Properties that
+    are not in COL_LIST are skipped.
 
     Args:
         properties_dict (dict): properties of a Notion entry.
@@ -107,7 +781,8 @@ def handle_properties(properties_dict):
     """
     new_prop_dict = {}
     for prop, prop_dict in properties_dict.items():
-        new_prop_dict[prop] = get_property_content(prop_dict)
+        if prop in COL_SET:
+            new_prop_dict[prop] = get_property_content(prop_dict)
 
     return new_prop_dict
 
@@ -119,16 +794,10 @@ def get_property_content(property_dict):
     indicates the type of the property. The content of the property is stored
     in a key that has the same name as the type.
 
-    This function handles the following types:
-    - rich_text
-    - title
-    - select
-    - multi_select
-
-    For other types, the function returns the value stored in the key that has
-    the same name as the type. If there is no such key, it returns None.
-
-    It will be updated as we come across more types.
+    The content is extracted by the function registered for the type in
+    PROPERTY_EXTRACTOR_DICT (see `register_extractor`). For other types, the
+    function returns the value stored in the key that has the same name as the
+    type. If there is no such key, it returns NaN.
 
     Args:
         property_dict (dict): property of a Notion entry.
@@ -136,28 +805,123 @@ def get_property_content(property_dict):
     Returns:
         str: content of the property.
     """
-    # most cell will have the content in a key
-    # and that key is stored in property_dict["type"]
-    # we treat exceptions
     property_type = property_dict["type"]
-    if property_type in ["rich_text", "title"]:
-        rich_text_list = property_dict[property_type]
-        if len(rich_text_list) > 0:
-            return rich_text_list[0]["plain_text"]
-        else:
-            return np.nan
-    elif property_type == "select":
-        select_dict = property_dict.get("select", {})
-        # if None selected, select_dict will be None
-        select_dict = {} if select_dict is None else select_dict
-        return select_dict.get("name", np.nan)
-    elif property_type == "multi_select":
-        select_list = [
-            select["name"] for select in property_dict["multi_select"]
-        ]
-        if select_list:
-            return ", ".join(select_list)
-        else:
-            return np.nan
-    else:
-        return property_dict.get(property_type, np.nan)
+    extract = PROPERTY_EXTRACTOR_DICT.get(property_type, _extract_default)
+
+    return extract(property_dict.get(property_type))
+
+
+def compile_extractors(schema_dict, raw_col_list=RAW_COL_LIST):
+    """Compiles one extractor per column of COL_LIST from the database schema.
+
+    The type of every property is looked up once, instead of once per cell. The
+    text of the columns not in `raw_col_list` is normalized by `normalize_text`
+    while it is extracted.
+
+    Args:
+        schema_dict (dict): maps the name of each property in COL_LIST to its "id"
+            and "type", as returned by `NotionClient.get_schema`.
+        raw_col_list (list, optional): columns that are not normalized. Defaults to
+            RAW_COL_LIST.
+
+    Returns:
+        tuple: one function per column of COL_LIST, in the same order, that takes a
+        page from the Notion API and returns the content of the column.
+    """
+    def compile_column(col):
+        if col == PAGE_ID_COL:
+            return lambda page: page["id"]
+        property_type = schema_dict[col]["type"]
+        extract = PROPERTY_EXTRACTOR_DICT.get(property_type, _extract_default)
+
+        if col not in raw_col_list:
+            extract_raw = extract
+
+            def extract(value):
+                return normalize_text(extract_raw(value))
+
+        def extract_column(page):
+            property_dict = page["properties"].get(col)
+            if property_dict is None:
+                return np.nan
+            return extract(property_dict[property_type])
+
+        return extract_column
+
+    return tuple(compile_column(col) for col in COL_LIST)
+
+
+# maps a property type to the function extracting the content of its value,
+# i.e. property_dict[property_dict["type"]]
+PROPERTY_EXTRACTOR_DICT = {}
+
+
+def register_extractor(*property_type_list):
+    """Registers the decorated function as the extractor of the property types.
+
+    Args:
+        *property_type_list (str): types of Notion properties, e.g. "rich_text".
+
+    Returns:
+        function: decorator that registers the function and returns it unchanged.
+    """
+    def decorator(extract):
+        for property_type in property_type_list:
+            PROPERTY_EXTRACTOR_DICT[property_type] = extract
+        return extract
+
+    return decorator
+
+
+@register_extractor("number", "checkbox", "last_edited_time", "created_time", "url",
+                    "email", "phone_number")
+def _extract_default(value):
+    return np.nan if value is None else value
+
+
+@register_extractor("rich_text", "title")
+def _extract_rich_text(rich_text_list):
+    if rich_text_list:
+        return rich_text_list[0]["plain_text"]
+    return np.nan
+
+
+@register_extractor("select", "status")
+def _extract_select(select_dict):
+    # if None selected, select_dict will be None
+    if select_dict is None:
+        return np.nan
+    return select_dict.get("name", np.nan)
+
+
+@register_extractor("multi_select")
+def _extract_multi_select(select_list):
+    if select_list:
+        return ", ".join(select["name"] for select in select_list)
+    return np.nan
+
+
+@register_extractor("date")
+def _extract_date(date_dict):
+    if date_dict is None:
+        return np.nan
+    return date_dict["start"]
+
+
+@register_extractor("formula")
+def _extract_formula(formula_dict):
+    # the result is stored like a property, e.g. {"type": "string", "string": "..."}
+    return get_property_content(formula_dict)
+
+
+@register_extractor("rollup")
+def _extract_rollup(rollup_dict):
+    if rollup_dict["type"] != "array":
+        return get_property_content(rollup_dict)
+    content_list = [
+        str(content) for content in map(get_property_content, rollup_dict["array"])
+        if not pd.isna(content)
+    ]
+    if content_list:
+        return ", ".join(content_list)
+    return np.nan
@@ -0,0 +1,291 @@
+"""This module plans the changes to sync a Notion database to a Memrise course.
+
+The plan is computed in memory from the Notion entries and a snapshot of the words
+on Memrise, before the browser touches anything. It can be printed as a dry run, or
+executed by `handlers.execute_plan`.
+"""
+
+from dataclasses import dataclass, field
+from math import ceil
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src import utils as ut
+from src.constants import COL_LIST
+from src.records import WordRecord, WordTable
+
+# estimated browser round trips (page loads, clicks and waits) of each operation
+DELETE_ROUND_TRIPS = 4  # search the database, column map, confirm, refresh
+UPDATE_SETUP_ROUND_TRIPS = 3  # edit page, column map, save changes
+UPDATE_CELL_ROUND_TRIPS = 2  # click on the cell, set its value
+UPDATE_LEVEL_ROUND_TRIPS = 1  # expand the level
+ADD_SETUP_ROUND_TRIPS = 1  # edit page
+ADD_LEVEL_ROUND_TRIPS = 4  # create or expand the level, open bulk add, add
+
+
+@dataclass
+class Operation:
+    """One change to make on Memrise.
+
+    Attributes:
+        action (str): "add", "update", "delete", "duplicate_drop" or "duplicate_skip".
+        record (src.records.WordRecord): the word, from Notion for adds and updates,
+            and from Memrise for deletes.
+        edits (tuple): pairs (column, new value) of the cells to rewrite, for updates.
+        level (str, optional): ID of the level of the word on Memrise, if known.
+    """
+
+    action: str
+    record: WordRecord
+    edits: Tuple[Tuple[str, str], ...] = ()
+    level: Optional[str] = None
+
+    @property
+    def cell_id(self):
+        """str: ID of the word on Notion."""
+        return self.record.cell_id
+
+    @property
+    def word(self):
+        """str: the word, i.e. the value of its `French` column."""
+        return self.record.word
+
+
+@dataclass
+class SyncPlan:
+    """Ordered operations to sync a Notion database to a Memrise course.
+
+    Attributes:
+        duplicate_list (list): Notion duplicates that are dropped.
+        skip_list (list): new words from Notion that are not added because the same
+            word (see `utils.normalize_key`) is already on Memrise.
+        delete_list (list): words deleted from Notion, to delete from Memrise.
+        update_list (list): words whose content changed on Notion, grouped by level.
+        add_list (list): new words from Notion, from the oldest to the newest.
+        level_word_limit (int): number of words per level, used for the estimate.
+    """
+
+    duplicate_list: List[Operation] = field(default_factory=list)
+    skip_list: List[Operation] = field(default_factory=list)
+    delete_list: List[Operation] = field(default_factory=list)
+    update_list: List[Operation] = field(default_factory=list)
+    add_list: List[Operation] = field(default_factory=list)
+    level_word_limit: int = 20
+
+    @property
+    def counts(self):
+        """dict: number of operations of each action."""
+        return {
+            "duplicate_drop": len(self.duplicate_list),
+            "duplicate_skip": len(self.skip_list),
+            "delete": len(self.delete_list),
+            "update": len(self.update_list),
+            "add": len(self.add_list),
+        }
+
+    @property
+    def n_edits(self):
+        """int: number of cells rewritten by the updates."""
+        return sum(len(operation.edits) for operation in self.update_list)
+
+    @property
+    def estimated_round_trips(self):
+        """int: rough number of browser round trips needed to execute the plan."""
+        n_round_trips = DELETE_ROUND_TRIPS * len(self.delete_list)
+        if self.update_list:
+            n_levels = len({operation.level for operation in self.update_list})
+            n_round_trips += (UPDATE_SETUP_ROUND_TRIPS
+                              + UPDATE_LEVEL_ROUND_TRIPS * n_levels
+                              + UPDATE_CELL_ROUND_TRIPS * self.n_edits)
+        if self.add_list:
+            n_round_trips += (ADD_SETUP_ROUND_TRIPS + ADD_LEVEL_ROUND_TRIPS
+                              * ceil(len(self.add_list) / self.level_word_limit))
+        return n_round_trips
+
+    @property
+    def is_empty(self):
+        """bool: whether there is nothing to change on Memrise."""
+        return not (self.delete_list or self.update_list or self.add_list)
+
+    def table(self, action: str):
+        """Returns the words of an action.
+
+        Args:
+            action (str): "add", "update", "delete", "duplicate_drop" or
+                "duplicate_skip".
+
+        Returns:
+            src.records.WordTable: one word per operation, in the order of the plan.
+        """
+        operation_list = {
+            "duplicate_drop": self.duplicate_list,
+            "duplicate_skip": self.skip_list,
+            "delete": self.delete_list,
+            "update": self.update_list,
+            "add": self.add_list,
+        }[action]
+        return WordTable([operation.record for operation in operation_list])
+
+    def to_df(self, action: str):
+        """Returns the words of an action as a dataframe with the columns of COL_LIST.
+
+        Args:
+            action (str): "add", "update", "delete", "duplicate_drop" or
+                "duplicate_skip".
+
+        Returns:
+            pandas.DataFrame: one row per operation, in the order of the plan.
+        """
+        return self.table(action).to_df()
+
+    def edit_list(self):
+        """Returns the edits of the updates in the format of `mem.update_cells`.
+
+        Returns:
+            list: tuples (cell id, column, new value), grouped by cell id.
+        """
+        return [
+            (operation.cell_id, col, value)
+            for operation in self.update_list
+            for col, value in operation.edits
+        ]
+
+    def level_dict(self):
+        """Returns the levels of the updated words, when known.
+
+        Returns:
+            dict: maps the cell ids of the updates to the IDs of their levels.
+        """
+        return {
+            operation.cell_id: operation.level
+            for operation in self.update_list if pd.notna(operation.level)
+        }
+
+    def summary(self):
+        """Returns a human readable summary of the plan.
+
+        Returns:
+            str: the counts, the words of each action and the estimated round trips.
+        """
+        line_list = []
+        for action, operation_list in [("duplicate_drop", self.duplicate_list),
+                                       ("duplicate_skip", self.skip_list),
+                                       ("delete", self.delete_list),
+                                       ("update", self.update_list),
+                                       ("add", self.add_list)]:
+            line_list.append(f"{action}: {len(operation_list)}")
+            for operation in operation_list:
+                edited = ", ".join(col for col, _ in operation.edits)
+                line_list.append(
+                    f"    {operation.word} ({operation.cell_id})"
+                    + (f" [{edited}]" if edited else ""))
+        line_list.append(f"cells to rewrite: {self.n_edits}")
+        line_list.append(f"estimated browser round trips: {self.estimated_round_trips}")
+        return "\n".join(line_list)
+
+
+def find_duplicates(notion_df: pd.DataFrame):
+    """Finds the duplicates from Notion in the `French` column.
+
+    Words are compared by their keys (see `utils.normalize_key`), i.e. regardless of
+    case, whitespace and Unicode composition.
+
+    Args:
+        notion_df (pandas.DataFrame): dataframe of the entries in the Notion database,
+            sorted from the oldest to the newest.
+
+    Returns:
+        pandas.Series: True for the duplicates to drop, i.e. all but the most recent.
+    """
+    return notion_df["French"].map(ut.normalize_key).duplicated(keep="last")
+
+
+def make_plan(
+        notion_df: pd.DataFrame,
+        memrise_df: pd.DataFrame,
+        level_word_limit: int = 20,
+        notion_id_list: list = None,
+        ):
+    """Plans the changes to sync the Notion entries to the words on Memrise.
+
+    It doesn't touch the browser, so it runs in milliseconds.
+
+    Args:
+        notion_df (pandas.DataFrame): validated dataframe of the entries in the Notion
+            database.
+        memrise_df (pandas.DataFrame): dataframe of the words on Memrise, as returned
+            by `mem.get_all_words` or `StateStore.load`. If it has a "level id" column,
+            the updates are grouped by level. If it has a "key" column, it is used as
+            the keys of the words on Memrise.
+        level_word_limit (int, optional): number of words per level. Defaults to 20.
+        notion_id_list (list, optional): IDs of all the entries in the Notion database,
+            when `notion_df` doesn't contain all of them. Defaults to the cell ids of
+            `notion_df`.
+
+    Returns:
+        SyncPlan: the plan.
+    """
+    plan = SyncPlan(level_word_limit=level_word_limit)
+    # sort from oldest to newest so that older words get added first later
+    notion_df = notion_df.sort_values(by="date modified", ascending=True)
+    # keep the most recent of the duplicates
+    duplicate_mask = find_duplicates(notion_df)
+    plan.duplicate_list = _to_operations("duplicate_drop", notion_df[duplicate_mask])
+    notion_df = notion_df[np.logical_not(duplicate_mask)]
+    if memrise_df.empty:
+        plan.add_list = _to_operations("add", notion_df)
+        return plan
+
+    if notion_id_list is None:
+        deleted_df = ut.anti_join(memrise_df, notion_df, "cell id")
+    else:
+        # the dropped duplicates are deleted too, as when notion_df has all the entries
+        notion_id_set = set(notion_id_list) - {
+            operation.record.cell_id for operation in plan.duplicate_list}
+        deleted_df = memrise_df[np.logical_not(memrise_df["cell id"].isin(notion_id_set))]
+    plan.delete_list = _to_operations("delete", deleted_df)
+
+    updated_df = ut.changed_rows(notion_df, memrise_df, "cell id")
+    edit_dict = {}
+    for cell_id, col, value in ut.diff_cells(updated_df, memrise_df, "cell id"):
+        edit_dict.setdefault(cell_id, []).append((col, value))
+    level_dict = {}
+    if "level id" in memrise_df.columns:
+        level_dict = dict(zip(memrise_df["cell id"], memrise_df["level id"]))
+    update_list = _to_operations("update", updated_df, edit_dict, level_dict)
+    # group the updates by level, keeping the order within a level
+    level_order_dict = {}
+    for operation in update_list:
+        level_order_dict.setdefault(operation.level, len(level_order_dict))
+    plan.update_list = sorted(
+        update_list, key=lambda operation: level_order_dict[operation.level])
+
+    # don't add a word that stays on Memrise under another cell id
+    kept_memrise_df = memrise_df[np.logical_not(
+        memrise_df["cell id"].isin(deleted_df["cell id"]))]
+    if "key" in kept_memrise_df.columns:
+        memrise_key_set = set(kept_memrise_df["key"])
+    else:
+        memrise_key_set = set(kept_memrise_df["French"].map(ut.normalize_key))
+    new_df = ut.anti_join(notion_df, memrise_df, "cell id")
+    on_memrise_mask = new_df["French"].map(ut.normalize_key).isin(memrise_key_set)
+    plan.skip_list = _to_operations("duplicate_skip", new_df[on_memrise_mask])
+    plan.add_list = _to_operations("add", new_df[np.logical_not(on_memrise_mask)])
+    return plan
+
+
+def _to_operations(action, word_df, edit_dict=None, level_dict=None):
+    edit_dict = edit_dict or {}
+    level_dict = level_dict or {}
+    operation_list = []
+    for values in word_df[COL_LIST].itertuples(index=False, name=None):
+        record = WordRecord(values)
+        operation_list.append(Operation(
+            action=action,
+            record=record,
+            edits=tuple(edit_dict.get(record.cell_id, ())),
+            level=level_dict.get(record.cell_id),
+        ))
+    return operation_list
@@ -0,0 +1,133 @@
+"""This module contains the compact row model of the words passed between stages.
+
+A `WordTable` is validated once, when it is built from a dataframe. The stages after
+that iterate over its `WordRecord`s directly instead of validating, merging and
+copying dataframes again.
+"""
+
+from typing import Iterable, List, Union
+
+import pandas as pd
+
+from src.constants import COL_LIST, NOT_NULL_COL_LIST
+
+COL_INDEX_DICT = {col: i for i, col in enumerate(COL_LIST)}
+CELL_ID_INDEX = COL_INDEX_DICT["cell id"]
+WORD_INDEX = COL_INDEX_DICT["French"]
+
+
+class WordRecord:
+    """One word, with its values in the order of COL_LIST.
+
+    Args:
+        values (iterable): values of the word in the order of COL_LIST.
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: Iterable):
+        self.values = tuple(values)
+
+    def __getitem__(self, col: str):
+        return self.values[COL_INDEX_DICT[col]]
+
+    def __eq__(self, other):
+        return isinstance(other, WordRecord) and self.values == other.values
+
+    def __hash__(self):
+        return hash(self.values)
+
+    def __repr__(self):
+        return f"WordRecord({self.values!r})"
+
+    @property
+    def cell_id(self):
+        """str: ID of the word on Notion."""
+        return self.values[CELL_ID_INDEX]
+
+    @property
+    def word(self):
+        """str: the word, i.e. the value of its `French` column."""
+        return self.values[WORD_INDEX]
+
+    def items(self):
+        """Returns the pairs (column, value) of the word, in the order of COL_LIST."""
+        return zip(COL_LIST, self.values)
+
+
+class WordTable:
+    """Ordered words that were validated once.
+
+    Build it with `WordTable.from_df`, which validates the dataframe like
+    `mem.validate_input`. The constructor trusts its records.
+
+    Args:
+        record_list (list of WordRecord): the words.
+    """
+
+    __slots__ = ("record_list",)
+
+    def __init__(self, record_list: List[WordRecord] = None):
+        self.record_list = record_list or []
+
+    @classmethod
+    def from_df(cls, word_df: Union[pd.DataFrame, pd.Series, "WordTable"]):
+        """Validates a dataframe of words and returns its table.
+
+        Args:
+            word_df (pandas.DataFrame): dataframe of words with the columns of COL_LIST.
+                A WordTable is returned as is.
+
+        Returns:
+            WordTable: the valid words, i.e. without missing values in the columns of
+            NOT_NULL_COL_LIST.
+        """
+        if isinstance(word_df, WordTable):
+            return word_df
+        if isinstance(word_df, pd.Series):  # convert to a dataframe
+            word_df = word_df.to_frame().T
+        if not isinstance(word_df, pd.DataFrame):
+            raise ValueError("word_df must be a pandas dataframe")
+        valid_mask = word_df[NOT_NULL_COL_LIST].notna().all(axis=1)
+        return cls([
+            WordRecord(values) for values in word_df.loc[valid_mask, COL_LIST].itertuples(
+                index=False, name=None)
+        ])
+
+    def to_df(self):
+        """Returns the words as a dataframe with the columns of COL_LIST."""
+        df = pd.DataFrame.from_records(
+            [record.values for record in self.record_list], columns=COL_LIST)
+        df["date modified"] = pd.to_datetime(df["date modified"], utc=True)
+        return df
+
+    def __iter__(self):
+        return iter(self.record_list)
+
+    def __len__(self):
+        return len(self.record_list)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return WordTable(self.record_list[i])
+        return self.record_list[i]
+
+    @property
+    def empty(self):
+        """bool: whether the table has no words, like `pandas.DataFrame.empty`."""
+        return not self.record_list
+
+    @property
+    def cell_id_list(self):
+        """list: cell ids of the words, in order."""
+        return [record.cell_id for record in self.record_list]
+
+    def word_dict(self):
+        """Returns a dict mapping the cell ids to the words."""
+        return {record.cell_id: record.word for record in self.record_list}
+
+    def select(self, cell_id_list: Iterable[str]):
+        """Returns the table of the words whose cell ids are in `cell_id_list`."""
+        cell_id_set = set(cell_id_list)
+        return WordTable(
+            [record for record in self.record_list if record.cell_id in cell_id_set])
@@ -0,0 +1,117 @@
+"""This module collects the results of the operations made on Memrise.
+
+The results are appended as plain records to one list per column and turned into a
+dataframe once, at the end, instead of concatenating a dataframe per word, page or
+level.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.journal import JOURNAL_OP_LIST, Journal
+
+# op: "add", "update", "delete", "duplicate_drop" or "duplicate_skip"
+# duration: in seconds, NaN if nothing was done on Memrise
+# level: ID of the level of the word on Memrise, if known
+RESULT_COL_LIST = ["op", "cell id", "word", "success", "error", "duration", "level"]
+
+
+class ResultCollector:
+    """Collects the result of each operation.
+
+    Attributes:
+        word_dict (dict): maps the cell ids to their words, to fill the word of the
+            results added without it, e.g. by the `mem.*` functions that only know the
+            cell ids.
+
+    Args:
+        journal (src.journal.Journal, optional): journal to append the successful
+            adds, updates and deletes to, as they are collected. Defaults to None.
+    """
+
+    def __init__(self, journal: Journal = None):
+        self._column_dict = {col: [] for col in RESULT_COL_LIST}
+        self.word_dict = {}
+        self.journal = journal
+
+    def __len__(self):
+        return len(self._column_dict["cell id"])
+
+    def add(
+            self,
+            op: str,
+            cell_id: str,
+            success: bool,
+            error: str = np.nan,
+            duration: float = np.nan,
+            level: str = np.nan,
+            word: str = np.nan,
+            ):
+        """Adds the result of an operation.
+
+        Args:
+            op (str): the operation.
+            cell_id (str): ID of the word on Notion.
+            success (bool): whether the operation succeeded.
+            error (str, optional): error message if it failed. Defaults to NaN.
+            duration (float, optional): time taken in seconds. Defaults to NaN.
+            level (str, optional): ID of the level of the word. Defaults to NaN.
+            word (str, optional): the word. Defaults to NaN, i.e. the word of the cell
+                id in `word_dict`.
+        """
+        for col, value in [("op", op), ("cell id", cell_id), ("word", word),
+                           ("success", success), ("error", error),
+                           ("duration", duration), ("level", level)]:
+            self._column_dict[col].append(value)
+        if success and self.journal is not None and op in JOURNAL_OP_LIST:
+            self.journal.record(op, cell_id, level)
+
+    def add_sent(self, cell_id_list: list, level: str):
+        """Journals the words sent to a level with a bulk add, before they are confirmed.
+
+        Args:
+            cell_id_list (list): IDs of the words on Notion.
+            level (str): ID of the level on Memrise.
+        """
+        if self.journal is not None:
+            self.journal.record_sent(cell_id_list, level)
+
+    def to_df(self, start: int = 0):
+        """Returns the results as a dataframe with the columns of RESULT_COL_LIST.
+
+        Args:
+            start (int, optional): index of the first result to return, e.g. the
+                length of the collector before an operation, to get the results of
+                that operation only. Defaults to 0.
+
+        Returns:
+            pandas.DataFrame: the results, in the order they were added.
+        """
+        column_dict = {col: value_list[start:]
+                       for col, value_list in self._column_dict.items()}
+        column_dict["word"] = [
+            self.word_dict.get(cell_id, np.nan) if pd.isna(word) else word
+            for cell_id, word in zip(column_dict["cell id"], column_dict["word"])
+        ]
+        res_df = pd.DataFrame(column_dict, columns=RESULT_COL_LIST)
+        res_df["success"] = res_df["success"].astype(bool)
+        return res_df
+
+
+def summarize(res_df: pd.DataFrame):
+    """Returns the number, successes and durations of each operation.
+
+    Args:
+        res_df (pandas.DataFrame): results, e.g. from `ResultCollector.to_df`.
+
+    Returns:
+        pandas.DataFrame: one row per operation, indexed by "op". The durations are
+        in seconds.
+    """
+    return res_df.groupby("op").agg(
+        count=("cell id", "size"),
+        success=("success", "sum"),
+        mean_duration=("duration", "mean"),
+        max_duration=("duration", "max"),
+        total_duration=("duration", "sum"),
+    )
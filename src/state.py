@@ -0,0 +1,185 @@
+"""This module keeps the state of the words synced to Memrise between runs.
+
+For each word of a course, the store records where it is on Memrise (level id, thing
+id, and position in the level), the content hash it was synced with, its key to find
+duplicates, and its row. A run can then plan the changes from the store instead of
+scraping the whole course.
+"""
+
+import json
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+from src import utils as ut
+from src.constants import COL_LIST, FOLD_ACCENTS, LOCATION_COL_LIST
+
+STATE_PATH = "state/memrise_state.sqlite"
+CELL_ID_INDEX = COL_LIST.index("cell id")
+WORD_INDEX = COL_LIST.index("French")
+
+
+class StateStore:
+    """On-disk state of the words synced to Memrise courses, in SQLite.
+
+    The SQLite file is in WAL mode, and every change is one transaction, so an
+    interrupted run leaves the words synced before the interruption. The words of a
+    course are dropped when COL_LIST or FOLD_ACCENTS changes.
+
+    Args:
+        path (str, optional): path of the SQLite file. Defaults to STATE_PATH.
+    """
+
+    def __init__(self, path: str = STATE_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS word ("
+                "course_url TEXT, cell_id TEXT, level_id TEXT, thing_id TEXT, "
+                "position INTEGER, hash TEXT, key TEXT, row TEXT, "
+                "PRIMARY KEY (course_url, cell_id))")
+            self.connection.execute(
+                "CREATE INDEX IF NOT EXISTS word_key ON word (course_url, key)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS course ("
+                "course_url TEXT PRIMARY KEY, settings TEXT)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the connection to the SQLite file."""
+        self.connection.close()
+
+    def copy(self):
+        """Returns an in-memory copy of the store, e.g. to plan a dry run with it.
+
+        Returns:
+            StateStore: the copy, changing it leaves the store as it is.
+        """
+        state = StateStore(":memory:")
+        self.connection.backup(state.connection)
+        return state
+
+    def is_scanned(self, course_url: str):
+        """Returns whether the course was scanned with the current COL_LIST, i.e.
+        whether `load` returns its words."""
+        return self._is_up_to_date(course_url)
+
+    def load(self, course_url: str):
+        """Loads the words of a course as they were last synced.
+
+        Args:
+            course_url (str): url of the edit page of the course.
+
+        Returns:
+            pandas.DataFrame: the words, with the columns of COL_LIST, LOCATION_COL_LIST,
+            "hash" and "key", in the order they were scanned or added. None if the course
+            was never scanned with the current COL_LIST.
+        """
+        if not self._is_up_to_date(course_url):
+            return None
+        cursor = self.connection.execute(
+            "SELECT level_id, thing_id, position, hash, key, row FROM word "
+            "WHERE course_url = ? ORDER BY rowid", (course_url,))
+        record_list = [
+            (*[np.nan if value is None else value for value in json.loads(row)],
+             level_id, thing_id, position, row_hash, key)
+            for level_id, thing_id, position, row_hash, key, row in cursor
+        ]
+        word_df = pd.DataFrame.from_records(
+            record_list, columns=COL_LIST + LOCATION_COL_LIST + ["hash", "key"])
+        word_df["date modified"] = pd.to_datetime(word_df["date modified"], utc=True)
+
+        return word_df
+
+    def replace(self, course_url: str, word_df: pd.DataFrame):
+        """Replaces the words of a course, e.g. after scanning the whole course.
+
+        Args:
+            course_url (str): url of the edit page of the course.
+            word_df (pandas.DataFrame): all the words of the course, as returned by
+                `mem.get_all_words(..., with_location=True)`.
+        """
+        with self.connection:  # one transaction
+            self.connection.execute(
+                "DELETE FROM word WHERE course_url = ?", (course_url,))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO course VALUES (?, ?)",
+                (course_url, _settings()))
+            self._upsert(course_url, word_df)
+
+    def upsert(self, course_url: str, word_df: pd.DataFrame):
+        """Records the words added or updated on Memrise.
+
+        The location of a word is kept when `word_df` doesn't have it, e.g. after an
+        update.
+
+        Args:
+            course_url (str): url of the edit page of the course.
+            word_df (pandas.DataFrame): the synced words, with the columns of COL_LIST
+                and, optionally, some of LOCATION_COL_LIST.
+        """
+        if not self._is_up_to_date(course_url):
+            # the next run scans the whole course anyway
+            return
+        with self.connection:
+            self._upsert(course_url, word_df)
+
+    def _upsert(self, course_url, word_df):
+        location_df = word_df.reindex(columns=LOCATION_COL_LIST)
+        entry_list = []
+        for row, (level_id, thing_id, position), row_hash in zip(
+                word_df[COL_LIST].itertuples(index=False, name=None),
+                location_df.itertuples(index=False, name=None),
+                ut.content_hash(word_df)):
+            entry_list.append((
+                course_url,
+                row[CELL_ID_INDEX],
+                None if pd.isna(level_id) else str(level_id),
+                None if pd.isna(thing_id) else str(thing_id),
+                None if pd.isna(position) else int(position),
+                row_hash,
+                ut.normalize_key(row[WORD_INDEX]),
+                json.dumps([None if pd.isna(value) else ut.canonical_value(value)
+                            for value in row]),
+            ))
+        self.connection.executemany(
+            "INSERT INTO word VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (course_url, cell_id) DO UPDATE SET "
+            "level_id = COALESCE(excluded.level_id, level_id), "
+            "thing_id = COALESCE(excluded.thing_id, thing_id), "
+            "position = COALESCE(excluded.position, position), "
+            "hash = excluded.hash, key = excluded.key, row = excluded.row", entry_list)
+
+    def delete(self, course_url: str, cell_id_list):
+        """Drops the words deleted from Memrise.
+
+        Args:
+            course_url (str): url of the edit page of the course.
+            cell_id_list (list): cell ids of the deleted words.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM word WHERE course_url = ? AND cell_id = ?",
+                [(course_url, cell_id) for cell_id in cell_id_list])
+
+    def _is_up_to_date(self, course_url: str):
+        # whether the course was scanned with the current settings
+        settings = self.connection.execute(
+            "SELECT settings FROM course WHERE course_url = ?",
+            (course_url,)).fetchone()
+        return settings is not None and settings[0] == _settings()
+
+
+def _settings():
+    # what the stored rows and keys depend on
+    return json.dumps({"col_list": COL_LIST, "fold_accents": FOLD_ACCENTS})
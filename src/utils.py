@@ -1,8 +1,15 @@
 """Utility functions."""
 
+import hashlib
+import re
+import unicodedata
 from typing import Union, List
 import pandas as pd
 
+from src.constants import COL_LIST, FOLD_ACCENTS, HASH_COL_LIST
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
 
 def semi_join(df1:pd.DataFrame, df2:pd.DataFrame, on:Union[str, List[str]]):
     """Returns the rows of df1 whose values in a certain column (or more) exist on df2.
@@ -10,6 +17,9 @@ def semi_join(df1:pd.DataFrame, df2:pd.DataFrame, on:Union[str, List[str]]):
     Note: If the relation df1 to df2 is one-to-many, no duplicates will occur in the 
     result.
 
+    A single key column is matched with a hash lookup (`isin`) instead of a merge, so
+    no column is copied twice.
+
     Args:
         df1 (pandas.DataFrame): left dataframe.
         df2 (pandas.DataFrame): right dataframe.
@@ -20,6 +30,8 @@ def semi_join(df1:pd.DataFrame, df2:pd.DataFrame, on:Union[str, List[str]]):
         on df2.
     """
     on = on if isinstance(on, list) else [on]
+    if len(on) == 1:
+        return df1[df1[on[0]].isin(df2[on[0]])].reset_index(drop=True)
     df2_on = df2[on].drop_duplicates()
     df1_only = df1.merge(df2_on, on=on, how="inner")
 
@@ -30,6 +42,8 @@ def anti_join(df1:pd.DataFrame, df2:pd.DataFrame, on:Union[str, List[str]]):
     """Returns the rows of df1 whose values in a certain column (or more) do not exist 
     on df2.
 
+    A single key column is matched with a hash lookup (`isin`) instead of a merge.
+
     Args:
         df1 (pandas.DataFrame): left dataframe.
         df2 (pandas.DataFrame): right dataframe.
@@ -40,6 +54,8 @@ def anti_join(df1:pd.DataFrame, df2:pd.DataFrame, on:Union[str, List[str]]):
         exist on df2.
     """
     on = on if isinstance(on, list) else [on]
+    if len(on) == 1:
+        return df1[~df1[on[0]].isin(df2[on[0]])].reset_index(drop=True)
     intersect_cols_not_on = [col for col in df1.columns 
                              if col in df2.columns and col not in on]
     df_merged = df1.merge(df2, on=on, how="left", indicator=True)
@@ -51,3 +67,123 @@ def anti_join(df1:pd.DataFrame, df2:pd.DataFrame, on:Union[str, List[str]]):
         columns={col+"_x": col for col in intersect_cols_not_on})
 
     return df1_only
+
+
+def canonical_value(value):
+    """Returns the text of a cell as it is compared between Notion and Memrise.
+
+    Missing values become an empty string, and whole numbers lose their decimal part
+    because the Memrise tables are read back as floats.
+
+    Args:
+        value: content of a cell.
+
+    Returns:
+        str: the canonical text of the cell.
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def normalize_key(text: str, fold_accents: bool = FOLD_ACCENTS):
+    """Returns the key of a word to find its duplicates.
+
+    The text is composed (NFC), case folded, and its whitespace is collapsed, so
+    "Maison" and "maison ", or "é" typed as one or two characters, have the same key.
+
+    Args:
+        text (str): the word.
+        fold_accents (bool, optional): whether to also drop the accents, so "où" and
+            "ou" have the same key. Defaults to FOLD_ACCENTS.
+
+    Returns:
+        str: the key of the word.
+    """
+    key = unicodedata.normalize("NFC", canonical_value(text)).casefold()
+    key = WHITESPACE_PATTERN.sub(" ", key).strip()
+    if fold_accents:
+        key = "".join(char for char in unicodedata.normalize("NFKD", key)
+                      if not unicodedata.combining(char))
+    return key
+
+
+def content_hash(df: pd.DataFrame, col_list: List[str] = HASH_COL_LIST):
+    """Returns a stable hash of the content of each row.
+
+    Args:
+        df (pandas.DataFrame): dataframe of words.
+        col_list (list, optional): columns to hash. Defaults to HASH_COL_LIST.
+
+    Returns:
+        pandas.Series: hexadecimal hash of each row, with the index of df.
+    """
+    return pd.Series([
+        hashlib.sha1("\x1f".join(map(canonical_value, row)).encode("utf-8")).hexdigest()
+        for row in df[col_list].itertuples(index=False, name=None)
+    ], index=df.index, dtype=object)
+
+
+def changed_rows(new_df: pd.DataFrame, old_df: pd.DataFrame, on: str = "cell id"):
+    """Returns the rows of new_df that exist on old_df with a different content.
+
+    The content of the rows is compared with `content_hash`. The hashes of old_df
+    are read from its "hash" column if it has one, e.g. from `StateStore.load`.
+
+    Args:
+        new_df (pandas.DataFrame): dataframe of words, e.g. from Notion.
+        old_df (pandas.DataFrame): dataframe of the same words, e.g. from Memrise.
+        on (str, optional): key column. Defaults to "cell id".
+
+    Returns:
+        pandas.DataFrame: rows of new_df whose key exists on old_df and whose content
+        hash differs.
+    """
+    new_df = semi_join(new_df, old_df, on)
+    old_hash_dict = dict(zip(
+        old_df[on], old_df["hash"] if "hash" in old_df.columns else content_hash(old_df)))
+    old_hash_series = new_df[on].map(old_hash_dict).astype(object)
+
+    return new_df[content_hash(new_df).values != old_hash_series.values].reset_index(
+        drop=True)
+
+
+def diff_cells(
+        new_df: pd.DataFrame,
+        old_df: pd.DataFrame,
+        on: str = "cell id",
+        col_list: List[str] = None,
+        ):
+    """Returns the cells of new_df whose value differs from the same cell on old_df.
+
+    The values are compared with `canonical_value`. Rows of new_df whose key doesn't
+    exist on old_df are ignored.
+
+    Args:
+        new_df (pandas.DataFrame): dataframe of words, e.g. from Notion.
+        old_df (pandas.DataFrame): dataframe of the same words, e.g. from Memrise.
+        on (str, optional): key column. Defaults to "cell id".
+        col_list (list, optional): columns to compare. Defaults to the columns of
+            COL_LIST other than `on`.
+
+    Returns:
+        list: one tuple (key, column, new value) per changed cell, grouped by key in
+        the order of new_df. The new value is the canonical text of the cell.
+    """
+    col_list = col_list or [col for col in COL_LIST if col != on]
+    old_row_dict = {
+        row[0]: row[1:]
+        for row in old_df[[on] + col_list].itertuples(index=False, name=None)
+    }
+    edit_list = []
+    for row in new_df[[on] + col_list].itertuples(index=False, name=None):
+        old_row = old_row_dict.get(row[0])
+        if old_row is None:
+            continue
+        for col, new_value, old_value in zip(col_list, row[1:], old_row):
+            new_text = canonical_value(new_value)
+            if new_text != canonical_value(old_value):
+                edit_list.append((row[0], col, new_text))
+    return edit_list
@@ -0,0 +1,302 @@
+"""Benchmarks for `src/notion.py` on a synthetic Notion database.
+
+Not collected by pytest. Run from the root directory with:
+    python -m tests.bench_notion fetch [number of entries]
+    python -m tests.bench_notion extract [number of entries]
+    python -m tests.bench_notion parse [number of pages]
+    python -m tests.bench_notion prefetch [number of entries] [latency in ms]
+    python -m tests.bench_notion dtypes [number of entries]
+"""
+
+import sys
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from src import notion
+from src import utils as ut
+from src.constants import COL_LIST
+
+PAGE_SIZE = 100
+
+
+def make_client(fake):
+    # the fake API has no rate limit
+    return notion.NotionClient(session=fake, rate_limiter=notion.TokenBucket(10**6))
+
+
+def make_page(i):
+    """Returns a synthetic page with the properties of the French database."""
+    def rich_text(text):
+        return {"type": "rich_text", "rich_text": [{"plain_text": text}] if text else []}
+
+    return {
+        "id": str(uuid.UUID(int=i)),
+        "last_edited_time": "2023-11-21T12:01:00.000Z",
+        "properties": {
+            "French": {"type": "title", "title": [{"plain_text": f"mot  {i}\\n"}]},
+            "English": rich_text(f"word {i}"),
+            "Définition": rich_text(f"définition du mot {i}" if i % 3 else ""),
+            "Example": rich_text(f"un  exemple\n avec le mot {i}" if i % 2 else ""),
+            "Example Translation": rich_text(f"an example with word {i}" if i % 2 else ""),
+            "Part of Speech": {"type": "select", "select": {"name": ["verb", "noun", "adj"][i % 3]}},
+            "Gender": {"type": "select", "select": None if i % 2 else {"name": "m"}},
+            "Tags": {"type": "multi_select", "multi_select": [{"name": "a"}, {"name": "b"}]},
+            "Model": {"type": "select", "select": None},
+            "date modified": {"type": "last_edited_time",
+                              "last_edited_time": "2023-11-21T12:01:00.000Z"},
+            "Notes": rich_text("a column that is not synced " * 4),
+        },
+    }
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, response_dict):
+        self._response_dict = response_dict
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._response_dict
+
+
+class FakeNotion:
+    """Serves a synthetic database in pages of 100, like the query endpoint.
+
+    It can be passed as the session of a `NotionClient`.
+    """
+
+    def __init__(self, n_entries, latency=0):
+        self.page_list = [make_page(i) for i in range(n_entries)]
+        self.headers = {}
+        self.latency = latency  # in seconds, per request
+
+    def close(self):
+        pass
+
+    def request(self, method, url, **kwargs):
+        return getattr(self, method.lower())(url, **kwargs)
+
+    def get(self, url, timeout=None, **kwargs):
+        """Returns the schema of the database, where the ID of a property is its name."""
+        return FakeResponse({"properties": {
+            name: {"id": name, "type": prop["type"]}
+            for name, prop in self.page_list[0]["properties"].items()}})
+
+    def post(self, endpoint, headers=None, timeout=None, json=None, **kwargs):
+        time.sleep(self.latency)
+        start = int((json or {}).get("start_cursor") or 0)
+        end = start + PAGE_SIZE
+        has_more = end < len(self.page_list)
+        page_list = self.page_list[start:end]
+        filter_properties = (kwargs.get("params") or {}).get("filter_properties")
+        if filter_properties:
+            page_list = [
+                {**page, "properties": {name: page["properties"][name]
+                                        for name in filter_properties}}
+                for page in page_list
+            ]
+        return FakeResponse({
+            "results": page_list,
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None,
+        })
+
+
+def legacy_get_property_content(property_dict):
+    """`get_property_content` as it was before the extractor registry."""
+    property_type = property_dict["type"]
+    if property_type in ["rich_text", "title"]:
+        rich_text_list = property_dict[property_type]
+        if len(rich_text_list) > 0:
+            return rich_text_list[0]["plain_text"]
+        else:
+            return np.nan
+    elif property_type == "select":
+        select_dict = property_dict.get("select", {})
+        select_dict = {} if select_dict is None else select_dict
+        return select_dict.get("name", np.nan)
+    elif property_type == "multi_select":
+        select_list = [
+            select["name"] for select in property_dict["multi_select"]
+        ]
+        if select_list:
+            return ", ".join(select_list)
+        else:
+            return np.nan
+    else:
+        return property_dict.get(property_type, np.nan)
+
+
+def legacy_handle_properties(properties_dict):
+    """`handle_properties` as it was before skipping the columns not in COL_LIST."""
+    new_prop_dict = {}
+    for prop, prop_dict in properties_dict.items():
+        new_prop_dict[prop] = legacy_get_property_content(prop_dict)
+    return new_prop_dict
+
+
+def legacy_get_data_from_notion(notion_db_id, post):
+    """`get_data_from_notion` as it was before building the dataframe once."""
+    def legacy_handle_response(response):
+        df = pd.DataFrame(response.json()["results"])
+        df_copy = df[["id", "properties"]].copy()
+        df_copy.loc[:, "properties"] = df_copy["properties"].apply(
+            legacy_handle_properties)
+        df_copy.loc[:, "properties"] = df_copy.apply(
+            lambda row: {"cell id": row["id"], **row["properties"]}, axis=1)
+        new_df = pd.DataFrame(df_copy["properties"].tolist())
+        for col in new_df:
+            if new_df[col].isna().all():
+                continue
+            new_df[col] = new_df[col].str.replace(r"\\n+", "", regex=True)
+            new_df[col] = new_df[col].str.replace(r"\s+", " ", regex=True)
+            new_df[col] = new_df[col].str.strip()
+        for col in notion.DATE_COL_LIST:
+            new_df[col] = pd.to_datetime(new_df[col])
+        return new_df[COL_LIST]
+
+    endpoint = f"https://api.notion.com/v1/databases/{notion_db_id}/query"
+    response = post(endpoint)
+    df_clean = legacy_handle_response(response)
+    has_more = response.json()["has_more"]
+    while has_more:
+        response = post(endpoint, json={"start_cursor": response.json()["next_cursor"]})
+        df_clean = pd.concat([df_clean, legacy_handle_response(response)])
+        has_more = response.json()["has_more"]
+    return df_clean
+
+
+def measure(func):
+    """Returns the result, wall time in seconds and peak memory in MB of func()."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    wall_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, wall_time, peak / 2**20
+
+
+def bench_fetch(n_entries=50_000):
+    """Compares the old and new `get_data_from_notion` end to end."""
+    fake = FakeNotion(n_entries)
+    client = make_client(fake)
+    print(f"get_data_from_notion on {n_entries} synthetic entries")
+    before_df, before_time, before_peak = measure(
+        lambda: legacy_get_data_from_notion("db", fake.post))
+    after_df, after_time, after_peak = measure(
+        lambda: notion.get_data_from_notion("db", client))
+    pd.testing.assert_frame_equal(
+        notion.to_compact_dtypes(before_df.reset_index(drop=True)), after_df)
+    print(f"before: {before_time:8.2f} s  {before_peak:8.1f} MB peak")
+    print(f"after:  {after_time:8.2f} s  {after_peak:8.1f} MB peak")
+
+
+def bench_extract(n_entries=100_000):
+    """Compares extracting the COL_LIST rows with the if-chain and compiled extractors."""
+    fake = FakeNotion(n_entries)
+    page_list = fake.page_list
+    client = make_client(fake)
+    # without normalization, like the if-chain
+    extractor_tuple = notion.compile_extractors(
+        client.get_schema("db"), raw_col_list=COL_LIST)
+
+    def legacy_extract():
+        record_list = []
+        for page in page_list:
+            prop_dict = {"cell id": page["id"],
+                         **legacy_handle_properties(page["properties"])}
+            record_list.append(tuple(prop_dict.get(col, np.nan) for col in COL_LIST))
+        return record_list
+
+    print(f"property extraction on {n_entries} synthetic pages")
+    before_list, before_time, _ = measure(legacy_extract)
+    after_list, after_time, _ = measure(
+        lambda: notion.handle_results(page_list, extractor_tuple))
+    assert before_list == after_list
+    print(f"if-chain:  {before_time:8.2f} s")
+    print(f"compiled:  {after_time:8.2f} s")
+
+
+def bench_parse(n_pages=200):
+    """Compares the cost per page of 100 entries of normalizing the text in pandas
+    after building the dataframe, and while extracting the records."""
+    fake = FakeNotion(n_pages * PAGE_SIZE)
+    page_list = fake.page_list
+    schema_dict = make_client(fake).get_schema("db")
+    raw_extractor_tuple = notion.compile_extractors(schema_dict, raw_col_list=COL_LIST)
+    extractor_tuple = notion.compile_extractors(schema_dict)
+
+    def pandas_parse(results_list):
+        new_df = pd.DataFrame.from_records(
+            notion.handle_results(results_list, raw_extractor_tuple), columns=COL_LIST)
+        for col in new_df:
+            if new_df[col].isna().all():
+                continue
+            new_df[col] = new_df[col].str.replace(r"\\n+", "", regex=True)
+            new_df[col] = new_df[col].str.replace(r"\s+", " ", regex=True)
+            new_df[col] = new_df[col].str.strip()
+        for col in notion.DATE_COL_LIST:
+            new_df[col] = pd.to_datetime(new_df[col])
+        return new_df
+
+    def single_pass_parse(results_list):
+        return notion.records_to_df(
+            notion.handle_results(results_list, extractor_tuple), compact=False)
+
+    print(f"parse cost per page of {PAGE_SIZE} entries, over {n_pages} pages")
+    for name, parse in [("three pandas passes", pandas_parse),
+                        ("single pass", single_pass_parse)]:
+        start = time.perf_counter()
+        df_list = [parse(page_list[i:i + PAGE_SIZE])
+                   for i in range(0, len(page_list), PAGE_SIZE)]
+        wall_time = time.perf_counter() - start
+        print(f"{name:>20}: {1000 * wall_time / n_pages:8.2f} ms/page")
+    pd.testing.assert_frame_equal(df_list[-1], pandas_parse(page_list[-PAGE_SIZE:]))
+
+
+def bench_prefetch(n_entries=20_000, latency_ms=30):
+    """Compares fetching the pages in sequence and prefetching the next one."""
+    fake = FakeNotion(n_entries, latency=latency_ms / 1000)
+    client = make_client(fake)
+    client.get_schema("db")
+    print(f"get_data_from_notion on {n_entries} synthetic entries, "
+          f"{latency_ms} ms per request")
+    for max_prefetch in [0, notion.MAX_PREFETCH]:
+        start = time.perf_counter()
+        notion.get_data_from_notion("db", client, max_prefetch=max_prefetch)
+        wall_time = time.perf_counter() - start
+        print(f"max_prefetch={max_prefetch}: {wall_time:8.2f} s")
+
+
+def bench_dtypes(n_entries=50_000):
+    """Compares the memory and join time of the object and compact dataframes."""
+    fake = FakeNotion(n_entries)
+    schema_dict = make_client(fake).get_schema("db")
+    record_list = notion.handle_results(
+        fake.page_list, notion.compile_extractors(schema_dict))
+    # half of the words are on memrise, as scraped (object columns)
+    memrise_df = notion.records_to_df(record_list[::2], compact=False)
+    print(f"dataframe of {n_entries} synthetic entries")
+    for compact in [False, True]:
+        notion_df = notion.records_to_df(record_list, compact=compact)
+        memory = notion_df.memory_usage(deep=True).sum() / 2**20
+        start = time.perf_counter()
+        ut.anti_join(memrise_df, notion_df, "cell id")
+        ut.semi_join(notion_df, memrise_df, "cell id")
+        join_time = time.perf_counter() - start
+        print(f"compact={compact!s:>5}: {memory:8.1f} MB  joins {join_time:6.3f} s")
+
+
+if __name__ == "__main__":
+    bench_dict = {"fetch": bench_fetch, "extract": bench_extract, "parse": bench_parse,
+                  "prefetch": bench_prefetch, "dtypes": bench_dtypes}
+    bench_dict[sys.argv[1]](*[int(arg) for arg in sys.argv[2:]])
@@ -0,0 +1,68 @@
+"""Benchmarks for the joins of `src/utils.py`.
+
+Not collected by pytest. Run from the root directory with:
+    python -m tests.bench_utils [number of rows] ...
+"""
+
+import sys
+import time
+import uuid
+
+import pandas as pd
+
+from src.constants import COL_LIST
+from src.utils import anti_join, semi_join
+
+
+def legacy_semi_join(df1, df2, on):
+    """`semi_join` as it was before the hash lookup for a single key."""
+    on = on if isinstance(on, list) else [on]
+    df2_on = df2[on].drop_duplicates()
+    return df1.merge(df2_on, on=on, how="inner")
+
+
+def legacy_anti_join(df1, df2, on):
+    """`anti_join` as it was before the hash lookup for a single key."""
+    on = on if isinstance(on, list) else [on]
+    intersect_cols_not_on = [col for col in df1.columns
+                             if col in df2.columns and col not in on]
+    df_merged = df1.merge(df2, on=on, how="left", indicator=True)
+    df1_only = df_merged[df_merged["_merge"] == "left_only"]
+    df1_only = df1_only.drop(
+        columns=["_merge"]+[col+"_y" for col in intersect_cols_not_on])
+    return df1_only.rename(columns={col+"_x": col for col in intersect_cols_not_on})
+
+
+def make_word_df(n_rows, start=0):
+    """Returns a dataframe of words with the columns of COL_LIST."""
+    df = pd.DataFrame({col: [f"{col} {i}" for i in range(start, start + n_rows)]
+                       for col in COL_LIST})
+    df["cell id"] = [str(uuid.UUID(int=i)) for i in range(start, start + n_rows)]
+    return df
+
+
+def timeit(func, n_repeat=3):
+    """Returns the best wall time of func() in seconds."""
+    time_list = []
+    for _ in range(n_repeat):
+        start = time.perf_counter()
+        func()
+        time_list.append(time.perf_counter() - start)
+    return min(time_list)
+
+
+def main(*n_rows_list):
+    print(f"{'rows':>9} {'join':>10} {'merge':>9} {'hash':>9}")
+    for n_rows in n_rows_list or (10_000, 100_000, 1_000_000):
+        # notion and memrise share half of their words, as after a big edit
+        notion_df = make_word_df(n_rows)
+        memrise_df = make_word_df(n_rows, start=n_rows // 2)
+        for name, legacy_join, join in [("semi_join", legacy_semi_join, semi_join),
+                                        ("anti_join", legacy_anti_join, anti_join)]:
+            merge_time = timeit(lambda: legacy_join(notion_df, memrise_df, "cell id"))
+            hash_time = timeit(lambda: join(notion_df, memrise_df, "cell id"))
+            print(f"{n_rows:>9} {name:>10} {merge_time:8.3f}s {hash_time:8.3f}s")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,125 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from src import handlers as h
+from src import plan as pl
+from src.journal import Journal
+from src.memrise import validate_input
+from src.results import ResultCollector
+from src.state import StateStore
+
+COURSE_URL = "https://app.memrise.com/course/1/test/edit/"
+
+
+def read_data():
+    df = pd.read_csv("tests/data/test.csv")
+    df["date modified"] = pd.to_datetime(df["date modified"])
+    return validate_input(df)
+
+
+def test_journal(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    with Journal(path) as journal:
+        assert journal.empty
+        collector = ResultCollector(journal)
+        collector.add("duplicate_drop", "id 0", True)  # nothing done on memrise
+        collector.add("update", "id 1", True, level="7")
+        collector.add("delete", "id 2", False, "not found")
+        collector.add_sent(["id 3", "id 4"], "8")
+        collector.add("add", "id 3", True, level="8")
+        journal.record_words(read_data().iloc[:2])
+    # a killed run leaves its last line unfinished
+    with open(path, "a") as f:
+        f.write('{"op": "add", "cell')
+
+    with Journal(path) as journal:
+        committed_dict, sent_dict = journal.load()
+        assert committed_dict == {("update", "id 1"): "7", ("add", "id 3"): "8"}
+        assert sent_dict == {"id 4": "8"}
+        word_df = journal.load_words()
+        assert word_df["cell id"].tolist() == read_data()["cell id"].iloc[:2].tolist()
+        assert word_df["date modified"].dtype == "datetime64[ns, UTC]"
+        journal.clear()
+        assert journal.empty and journal.load() == ({}, {})
+
+
+def test_recover_from_journal(tmp_path):
+    word_df = read_data()
+    memrise_df = word_df.iloc[:8]
+    notion_df = word_df.iloc[1:].copy()
+    notion_df.loc[notion_df.index[0], "English"] = "updated"
+    with StateStore(":memory:") as state, \
+            Journal(str(tmp_path / "journal.jsonl")) as journal:
+        state.replace(COURSE_URL, memrise_df)
+        plan = pl.make_plan(notion_df, state.load(COURSE_URL))
+        assert plan.counts["delete"] == 1 and plan.counts["add"] == 2
+        # the run died after the delete, the update and one add
+        journal.record_words(pd.concat([plan.to_df("update"), plan.to_df("add")]))
+        collector = ResultCollector(journal)
+        collector.add("delete", plan.delete_list[0].cell_id, True)
+        updated_id = plan.update_list[0].cell_id
+        collector.add("update", updated_id, True)
+        added_id, remaining_id = plan.add_list[0].cell_id, plan.add_list[1].cell_id
+        collector.add("add", added_id, True, level="3")
+
+        # since the crash, the updated word was edited again and the added one removed
+        notion_df.loc[notion_df["cell id"] == updated_id, "English"] = "edited again"
+        notion_df = notion_df[notion_df["cell id"] != added_id]
+
+        driver = h._recover_from_journal(None, journal, COURSE_URL, state)
+        state_df = state.load(COURSE_URL)
+        plan = pl.make_plan(notion_df, state_df)
+    assert driver is None
+    assert [op.cell_id for op in plan.add_list] == [remaining_id]
+    assert [op.cell_id for op in plan.delete_list] == [added_id]
+    assert [op.cell_id for op in plan.update_list] == [updated_id]
+    assert plan.update_list[0].edits == (("English", "edited again"),)
+    assert state_df.set_index("cell id").loc[added_id, "level id"] == "3"
+
+
+def test_dry_run_resume_keeps_state(tmp_path, capsys):
+    word_df = read_data()
+    notion_df = word_df.iloc[1:]
+    with StateStore(":memory:") as state, \
+            Journal(str(tmp_path / "journal.jsonl")) as journal:
+        state.replace(COURSE_URL, word_df.iloc[:8])
+        state_df = state.load(COURSE_URL)
+        journal.record_words(word_df.iloc[[8]])
+        journal.record("delete", word_df["cell id"].iloc[0])
+        journal.record("add", word_df["cell id"].iloc[8], "3")
+
+        h.notion2memrise(None, notion_df, COURSE_URL, "", "", 20, dry_run=True,
+                         state=state, journal=journal, resume=True)
+        pd.testing.assert_frame_equal(state.load(COURSE_URL), state_df)
+        assert not journal.empty
+    # the plan skips the operations of the journal
+    out = capsys.readouterr().out
+    assert "delete: 0" in out and "add: 1" in out
+
+
+def test_dry_run_closes_state_copy(monkeypatch):
+    word_df = read_data()
+    copy_list = []
+
+    def fail(*args, **kwargs):
+        raise ValueError("planning failed")
+
+    with StateStore(":memory:") as state:
+        state.replace(COURSE_URL, word_df)
+        copy = state.copy
+
+        def keep_copy():
+            copy_list.append(copy())
+            return copy_list[-1]
+
+        monkeypatch.setattr(state, "copy", keep_copy)
+        monkeypatch.setattr(pl, "make_plan", fail)
+        with pytest.raises(ValueError):
+            h.notion2memrise(None, word_df, COURSE_URL, "", "", 20, dry_run=True,
+                             state=state)
+        # the copy is closed, the store is not
+        with pytest.raises(sqlite3.ProgrammingError):
+            copy_list[0].load(COURSE_URL)
+        assert state.load(COURSE_URL) is not None
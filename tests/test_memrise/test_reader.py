@@ -0,0 +1,156 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+from pandas.testing import assert_frame_equal
+import pytest
+import requests
+from lxml import html
+
+from src import handlers as h
+from src.constants import COL_LIST, LOCATION_COL_LIST
+from src.memrise.errors import NotDatabasePage
+from src.memrise import utils as ut
+from src.memrise.reader import MemriseReader
+
+
+def read_data():
+    df = pd.read_csv("tests/data/test.csv")
+    df["date modified"] = pd.to_datetime(df["date modified"])
+    return df
+
+
+def recorded_pages():
+    # the edit page with every level folded, and the html of each level
+    with open("tests/data/edit_page.html", encoding="utf-8") as f:
+        tree = html.fromstring(f.read())
+    level_html_dict = {}
+    for table_element in tree.xpath(ut.LEVEL_TABLE_XPATH):
+        wrapper_element = table_element.getparent()
+        level_html_dict[table_element.get("data-level-id")] = html.tostring(
+            wrapper_element, encoding="unicode")
+        wrapper_element.getparent().remove(wrapper_element)
+    return html.tostring(tree, encoding="unicode"), level_html_dict
+
+
+def read_db_page(page):
+    with open(f"tests/data/db_page_{page}.html", encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.fixture
+def course_url():
+    edit_html, level_html_dict = recorded_pages()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if self.headers.get("Cookie") != "sessionid=signed-in":
+                self.send_response(403)
+                self.end_headers()
+                return
+            if url.path == "/course/1/test/edit/":
+                body = edit_html
+            elif url.path == "/ajax/level/editing_html/":
+                level_id = parse_qs(url.query)["level_id"][0]
+                if level_id == "error":
+                    body = json.dumps({"error": "Level not found"})
+                else:
+                    body = json.dumps(
+                        {"rendered": level_html_dict.get(level_id, "<div></div>")})
+            elif url.path == "/course/1/test/edit/database/1/":
+                body = read_db_page(parse_qs(url.query).get("page", ["1"])[0])
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/course/1/test/edit/"
+    server.shutdown()
+    server.server_close()
+
+
+class FakeDriver:
+    # the signed-in driver, only its cookies are read
+    def get_cookies(self):
+        return [{"name": "sessionid", "value": "signed-in", "domain": "127.0.0.1",
+                 "path": "/"}]
+
+    def execute_script(self, script):
+        return "Mozilla/5.0"
+
+
+def test_reader_get_all_words(course_url, tmp_path):
+    df = read_data()
+    with MemriseReader.from_driver(
+            FakeDriver(), column_map_path=str(tmp_path / "column_map.json")) as reader:
+        words_df = reader.get_all_words(course_url, with_location=True)
+        # the edit page and one page per level
+        assert reader.n_requests == 5
+        level_df = reader.get_all_words(course_url, level_id_list=["12"])
+    assert_frame_equal(words_df[COL_LIST], df[COL_LIST])
+    assert words_df["level id"].tolist() == ["11"] * 6 + ["12"] * (len(df) - 6)
+    assert words_df["thing id"].tolist()[5:7] == ["1105", "1200"]
+    assert level_df["cell id"].tolist() == df["cell id"].iloc[6:].tolist()
+    # the column map is cached for the writes
+    assert "cell id" in ut._column_map_dict[course_url]
+
+
+def test_reader_level_error(course_url):
+    with MemriseReader.from_driver(FakeDriver(), column_map_path=None) as reader:
+        with pytest.raises(ValueError, match="Level not found"):
+            reader.get_level_html(course_url, "error")
+
+
+def test_reader_not_signed_in(course_url):
+    with MemriseReader(column_map_path=None) as reader:
+        with pytest.raises(requests.HTTPError):
+            reader.get_all_words(course_url)
+
+
+def test_reader_get_all_words_from_db(course_url, tmp_path):
+    df = read_data()
+    db_url = course_url + "database/1/"
+    column_map_path = str(tmp_path / "column_map.json")
+    with MemriseReader.from_driver(FakeDriver(), column_map_path=column_map_path) as reader:
+        words_df = reader.get_all_words_from_db(db_url)
+        assert reader.n_requests == 2  # the first page gives the number of pages
+        # with the column map of the course
+        reader.get_all_words(course_url)
+        assert_frame_equal(reader.get_all_words_from_db(db_url, course_url), words_df)
+    assert_frame_equal(words_df, df[COL_LIST])
+
+
+def test_reader_not_database_page(course_url, tmp_path):
+    # e.g. a sign in page served with a 200 after the cookies expired
+    with MemriseReader.from_driver(
+            FakeDriver(), column_map_path=str(tmp_path / "column_map.json")) as reader:
+        with pytest.raises(NotDatabasePage):
+            reader.get_all_words_from_db(course_url)
+
+
+def test_read_words_from_db(course_url, tmp_path):
+    with MemriseReader.from_driver(
+            FakeDriver(), column_map_path=str(tmp_path / "column_map.json")) as reader:
+        _, memrise_df = h._read_words(
+            None, reader, course_url, course_db_url=course_url + "database/1/")
+    assert list(memrise_df.columns) == COL_LIST + LOCATION_COL_LIST
+    assert memrise_df["cell id"].tolist() == read_data()["cell id"].tolist()
+    assert memrise_df["level id"].isna().all()
+
+
+def test_db_page_count():
+    assert ut.db_page_count(read_db_page(2)) == 2
+    assert ut.db_page_count("<html><body></body></html>") == 1
+    assert ut.format_words_df(ut.values_to_df(COL_LIST, [])).empty
@@ -1,13 +1,16 @@
 import pandas as pd
 import pytest
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
-from src.constants import MEMRISE_EMAIL, MEMRISE_PASSWORD
-from src.memrise.constants import FIREFOX_PATH, TIMEOUT_LIMIT
+from src.constants import COL_LIST, MEMRISE_EMAIL, MEMRISE_PASSWORD
+from src.memrise.constants import (
+    DEFAULT_SCRIPT_TIMEOUT, DISCONNECT_SHOW_ALL_LEVELS_JAVA_SCRIPT, FIREFOX_PATH,
+    LEVEL_SHOW_TIME, TIMEOUT_LIMIT)
 from src.memrise import utils as ut
 from tests.constants import COURSE_EDIT_URL, DB_NAME
 
@@ -44,3 +47,69 @@ def test_create_new_level(driver):
             EC.presence_of_element_located(
                 (By.XPATH, "//div[@class='level']")))
     assert new_level is not None
+
+def read_edit_page():
+    with open("tests/data/edit_page.html", encoding="utf-8") as f:
+        return f.read()
+
+def test_page_source_to_df():
+    df = read_data()
+    page_df = ut.page_source_to_df(read_edit_page())
+    # the collapsed level has no table, the empty one has no words
+    assert page_df["level"].tolist() == ["1-Verbs"] * 6 + ["2-Nouns"] * (len(df) - 6)
+    assert page_df["level id"].tolist() == ["11"] * 6 + ["12"] * (len(df) - 6)
+    assert page_df["thing id"].tolist()[5:7] == ["1105", "1200"]
+    assert page_df["position"].tolist()[5:7] == [5, 0]
+    # the buttons are not in the text, the values are parsed like pd.read_html
+    page_df["date modified"] = pd.to_datetime(page_df["date modified"])
+    pd.testing.assert_frame_equal(page_df[COL_LIST], df[COL_LIST])
+
+def test_page_source_to_df_levels():
+    page_df = ut.page_source_to_df(read_edit_page(), level_id_list=["12", "13"])
+    assert set(page_df["level id"]) == {"12"}
+    assert ut.page_source_to_df("<html><body></body></html>") is None
+
+def test_column_map_cache(tmp_path):
+    path = str(tmp_path / "column_map.json")
+    url = "https://app.memrise.com/course/2/cached/edit/"
+    ut.cache_column_map(url, read_edit_page(), path)
+    # served from the memory, then from the disk, without the driver
+    _, column_predicate_dict = ut.cell_col_to_xpath_predicate(None, url, path)
+    assert column_predicate_dict["cell id"] == "@class='cell text column' and @data-key='6'"
+    assert column_predicate_dict[""] == "@class='' and @data-key=''"
+    ut._column_map_dict.clear()
+    assert ut.cell_col_to_xpath_predicate(None, url, path)[1] == column_predicate_dict
+    # a miss drops it from both
+    ut.invalidate_column_map(url, path)
+    assert url not in ut._column_map_dict
+    assert ut._load_column_map_dict(path) == {}
+
+
+class ShowAllLevelsDriver:
+    # a driver whose one-shot script times out, with every level already shown for
+    # the fallback
+    def __init__(self):
+        self.script_list = []
+        self.script_timeout_list = []
+
+    def find_elements_by_xpath(self, xpath):
+        return [None] * 10  # folded levels
+
+    def set_script_timeout(self, timeout):
+        self.script_timeout_list.append(timeout)
+
+    def execute_async_script(self, script):
+        raise TimeoutException()
+
+    def execute_script(self, script):
+        self.script_list.append(script)
+
+
+def test_show_all_level_tables_timeout(monkeypatch):
+    driver = ShowAllLevelsDriver()
+    monkeypatch.setattr(ut, "_get_show_btns_for_folded_levels", lambda driver: (driver, []))
+    assert ut.show_all_level_tables(driver) is driver
+    # scaled with the folded levels, then restored
+    assert driver.script_timeout_list == [
+        TIMEOUT_LIMIT + 10 * LEVEL_SHOW_TIME, DEFAULT_SCRIPT_TIMEOUT]
+    assert driver.script_list == [DISCONNECT_SHOW_ALL_LEVELS_JAVA_SCRIPT]
@@ -0,0 +1,427 @@
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pytest
+import requests
+import pandas as pd
+
+from src import handlers as hr
+from src import memrise as mem
+from src import notion
+from src import utils as ut
+from src.constants import COL_LIST
+
+
+def make_client(session):
+    # don't wait for the rate limit of the API in the tests
+    return notion.NotionClient(session=session, rate_limiter=notion.TokenBucket(1000))
+
+
+def make_page(i):
+    return {
+        "id": f"cell-{i}",
+        "last_edited_time": "2023-11-21T12:01:00.000Z",
+        "properties": {
+            "French": {"type": "title", "title": [{"plain_text": f"mot\\n  {i} "}]},
+            "English": {"type": "rich_text", "rich_text": [{"plain_text": f"word {i}"}]},
+            "Part of Speech": {"type": "select", "select": {"name": "verb"}},
+            "Gender": {"type": "select", "select": None},
+            "Tags": {"type": "multi_select",
+                     "multi_select": [{"name": "a"}, {"name": "b"}]},
+            "date modified": {"type": "last_edited_time",
+                              "last_edited_time": "2023-11-21T12:01:00.000Z"},
+            "Notes": {"type": "rich_text", "rich_text": [{"plain_text": "not synced"}]},
+        },
+    }
+
+
+def property_id(name):
+    # Notion returns the IDs URL-encoded
+    return notion.TITLE_PROPERTY_ID if name == "French" else quote(f":{name}")
+
+
+PROPERTY_TYPE_DICT = {
+    "French": "title",
+    "Part of Speech": "select",
+    "Gender": "select",
+    "Model": "select",
+    "Tags": "multi_select",
+    "date modified": "last_edited_time",
+}
+SCHEMA_DICT = {
+    "properties": {
+        name: {"id": property_id(name), "type": PROPERTY_TYPE_DICT.get(name, "rich_text")}
+        for name in COL_LIST + ["Notes"] if name != "cell id"
+    }
+}
+
+
+class FakeResponse:
+    def __init__(self, response_dict, status_code=200, headers=None):
+        self.response_dict = response_dict
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.n_json_calls = 0
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+    def json(self):
+        self.n_json_calls += 1
+        return self.response_dict
+
+
+class FakeSession:
+    """Serves `n_pages` pages of `page_size` results from the query endpoint."""
+
+    def __init__(self, n_entries, page_size=2):
+        self.page_list = [make_page(i) for i in range(n_entries)]
+        self.page_size = page_size
+        self.headers = {}
+        self.body_list = []
+        self.params_list = []
+        self.response_list = []
+        self.n_get_calls = 0
+
+    def request(self, method, url, **kwargs):
+        return getattr(self, method.lower())(url, **kwargs)
+
+    def get(self, url, timeout=None, **kwargs):
+        self.n_get_calls += 1
+        return FakeResponse(SCHEMA_DICT)
+
+    def post(self, url, params=None, json=None, timeout=None, **kwargs):
+        self.body_list.append(json)
+        self.params_list.append(params)
+        start = int(json.get("start_cursor", 0))
+        end = start + self.page_size
+        has_more = end < len(self.page_list)
+        page_list = self.page_list[start:end]
+        if params:  # only return the requested properties
+            page_list = [
+                {**page, "properties": {
+                    name: prop for name, prop in page["properties"].items()
+                    if unquote(property_id(name)) in params["filter_properties"]}}
+                for page in page_list
+            ]
+        response = FakeResponse({
+            "results": page_list,
+            "has_more": has_more,
+            "next_cursor": str(end) if has_more else None,
+        })
+        self.response_list.append(response)
+        return response
+
+    def close(self):
+        pass
+
+
+def test_get_data_from_notion():
+    session = FakeSession(5)
+    client = make_client(session)
+    df = notion.get_data_from_notion("db", client)
+
+    assert df.columns.tolist() == COL_LIST
+    assert df["cell id"].tolist() == [f"cell-{i}" for i in range(5)]
+    assert df["French"].tolist() == [f"mot {i}" for i in range(5)]
+    assert df["Tags"].tolist() == ["a, b"] * 5
+    assert df["Gender"].isna().all()
+    assert df["date modified"].dtype == "datetime64[ns, UTC]"
+    # three pages, each decoded once
+    assert [body.get("start_cursor") for body in session.body_list] == [None, "2", "4"]
+    assert all(body["page_size"] == notion.PAGE_SIZE for body in session.body_list)
+    assert all(response.n_json_calls == 1 for response in session.response_list)
+    assert session.headers["Notion-Version"] == notion.NOTION_VERSION
+    # only the synced properties are requested, and the schema is fetched once
+    # the IDs are sent decoded, requests encodes them once
+    assert session.params_list[0]["filter_properties"] == [
+        unquote(property_id(col)) for col in COL_LIST if col != "cell id"]
+    assert "%" in property_id("English")
+    assert session.n_get_calls == 1
+    notion.get_data_from_notion("db", client)
+    assert session.n_get_calls == 1
+
+
+def test_handle_properties_skips_other_columns():
+    prop_dict = notion.handle_properties(make_page(0)["properties"])
+    assert "Notes" not in prop_dict
+    assert prop_dict["English"] == "word 0"
+
+
+def test_get_data_from_notion_empty():
+    client = make_client(FakeSession(0))
+    df = notion.get_data_from_notion("db", client)
+
+    assert df.empty
+    assert df.columns.tolist() == COL_LIST
+
+
+def test_get_property_content():
+    assert notion.get_property_content(
+        {"type": "select", "select": None}) is np.nan
+    assert notion.get_property_content(
+        {"type": "rich_text", "rich_text": []}) is np.nan
+    assert notion.get_property_content(
+        {"type": "multi_select", "multi_select": [{"name": "a"}]}) == "a"
+    assert pd.isna(notion.get_property_content({"type": "unknown"}))
+
+
+def test_get_data_from_notion_edited_since():
+    session = FakeSession(3)
+    client = make_client(session)
+    edited_since = pd.Timestamp("2023-11-21 12:00:00+00:00")
+    notion.get_data_from_notion("db", client, edited_since=edited_since)
+
+    assert session.body_list[0]["filter"] == {
+        "timestamp": "last_edited_time",
+        "last_edited_time": {"on_or_after": "2023-11-21T12:00:00+00:00"},
+    }
+
+
+def test_get_page_ids_from_notion():
+    session = FakeSession(3)
+    client = make_client(session)
+
+    assert notion.get_page_ids_from_notion("db", client) == ["cell-0", "cell-1", "cell-2"]
+    assert session.params_list[0] == {"filter_properties": [notion.TITLE_PROPERTY_ID]}
+
+
+def test_watermark(tmp_path):
+    path = str(tmp_path / "state" / "watermark.json")
+    assert notion.load_watermark("db", path) is None
+
+    df = pd.DataFrame({"date modified": pd.to_datetime(
+        ["2023-11-21 12:01:00+00:00", "2023-11-22 08:00:00+00:00"])})
+    notion.save_watermark("db", df, path)
+    assert notion.load_watermark("db", path) == pd.Timestamp("2023-11-22 08:00:00+00:00")
+
+    # an empty or older fetch keeps the watermark
+    notion.save_watermark("db", df.iloc[:0], path)
+    notion.save_watermark("db", df.iloc[:1], path)
+    assert notion.load_watermark("db", path) == pd.Timestamp("2023-11-22 08:00:00+00:00")
+    assert notion.load_watermark("other db", path) is None
+
+
+def test_get_property_content_registered_types():
+    assert notion.get_property_content(
+        {"type": "date", "date": {"start": "2023-11-21", "end": None}}) == "2023-11-21"
+    assert notion.get_property_content({"type": "number", "number": 3}) == 3
+    assert notion.get_property_content({"type": "checkbox", "checkbox": False}) is False
+    assert notion.get_property_content(
+        {"type": "formula", "formula": {"type": "string", "string": "abc"}}) == "abc"
+    assert notion.get_property_content({"type": "rollup", "rollup": {
+        "type": "array",
+        "array": [{"type": "title", "title": [{"plain_text": "a"}]},
+                  {"type": "number", "number": 1}],
+    }}) == "a, 1"
+
+
+def test_register_extractor(monkeypatch):
+    monkeypatch.setattr(notion, "PROPERTY_EXTRACTOR_DICT",
+                        dict(notion.PROPERTY_EXTRACTOR_DICT))
+    notion.register_extractor("people")(
+        lambda people_list: ", ".join(person["name"] for person in people_list))
+
+    assert notion.get_property_content(
+        {"type": "people", "people": [{"name": "a"}, {"name": "b"}]}) == "a, b"
+
+
+def test_compile_extractors():
+    schema_dict = make_client(FakeSession(0)).get_schema("db")
+    extractor_tuple = notion.compile_extractors(schema_dict)
+    page_list = [make_page(i) for i in range(3)]
+
+    assert len(extractor_tuple) == len(COL_LIST)
+    assert notion.handle_results(page_list, extractor_tuple) == notion.handle_results(
+        page_list)
+
+
+def test_normalize_text():
+    assert notion.normalize_text(" un\\n\\n  exemple\n avec\tdes espaces ") == (
+        "un exemple avec des espaces")
+    assert notion.normalize_text(np.nan) is np.nan
+    assert notion.normalize_text(3) == 3
+
+
+def test_prefetch():
+    assert list(notion.prefetch(iter(range(10)), max_prefetch=2)) == list(range(10))
+
+    def fail_after_two():
+        yield 0
+        yield 1
+        raise ValueError("page failed")
+
+    iterator = notion.prefetch(fail_after_two())
+    assert next(iterator) == 0
+    assert next(iterator) == 1
+    with pytest.raises(ValueError, match="page failed"):
+        next(iterator)
+
+
+def test_prefetch_stops_early():
+    produced_list = []
+
+    def produce():
+        for i in range(100):
+            produced_list.append(i)
+            yield i
+
+    iterator = notion.prefetch(produce(), max_prefetch=2)
+    assert next(iterator) == 0
+    iterator.close()
+    # the producer is stopped once the queue is full
+    assert len(produced_list) <= 4
+
+
+class FlakySession(FakeSession):
+    """Throttles the first request and fails the second one on the server side."""
+
+    def __init__(self, n_entries):
+        super().__init__(n_entries)
+        self.status_code_list = [429, 503]
+
+    def post(self, url, params=None, json=None, timeout=None, **kwargs):
+        if self.status_code_list:
+            self.body_list.append(json)
+            status_code = self.status_code_list.pop(0)
+            headers = {"Retry-After": "2"} if status_code == 429 else None
+            return FakeResponse({}, status_code, headers)
+        return super().post(url, params, json, timeout, **kwargs)
+
+
+def test_client_retries(monkeypatch):
+    sleep_list = []
+    monkeypatch.setattr(notion.time, "sleep", sleep_list.append)
+    session = FlakySession(3)
+    client = make_client(session)
+
+    assert notion.get_page_ids_from_notion("db", client) == ["cell-0", "cell-1", "cell-2"]
+    assert client.n_requests == 4
+    assert client.n_retries == 2
+    # Retry-After first, then the backoff of the second attempt
+    assert sleep_list[0] == 2
+    assert notion.BACKOFF_BASE * 3 >= sleep_list[1] >= notion.BACKOFF_BASE
+    assert client.throttled_time >= sum(sleep_list)
+    # the failed page is asked again from the same cursor
+    assert [body.get("start_cursor") for body in session.body_list] == [None, None, None, "2"]
+
+
+def test_client_gives_up(monkeypatch):
+    monkeypatch.setattr(notion.time, "sleep", lambda seconds: None)
+    session = FlakySession(3)
+    session.status_code_list = [503] * 10
+    client = notion.NotionClient(
+        session=session, rate_limiter=notion.TokenBucket(1000), max_retries=2)
+
+    with pytest.raises(requests.HTTPError):
+        client.query_database("db")
+    assert client.n_requests == 3
+
+
+def test_get_data_from_notion_resumes(tmp_path, monkeypatch):
+    monkeypatch.setattr(notion.time, "sleep", lambda seconds: None)
+    cache = notion.PageCache(str(tmp_path / "cache.sqlite"))
+    session = FakeSession(5)
+    client = notion.NotionClient(
+        session=session, rate_limiter=notion.TokenBucket(1000), max_retries=1)
+    post = session.post
+
+    def fail_third_page(url, params=None, json=None, timeout=None, **kwargs):
+        if json.get("start_cursor") == "4":
+            return FakeResponse({}, 503)
+        return post(url, params, json, timeout, **kwargs)
+
+    monkeypatch.setattr(session, "post", fail_third_page)
+    with pytest.raises(requests.HTTPError) as error_info:
+        notion.get_data_from_notion("db", client, max_prefetch=0, cache=cache)
+    # the cursor of the page that failed, and the pages received are cached
+    assert error_info.value.start_cursor == "4"
+    assert len(cache.load("db")) == 4
+
+    monkeypatch.setattr(session, "post", post)
+    df = notion.get_data_from_notion(
+        "db", client, cache=cache, start_cursor=error_info.value.start_cursor)
+    assert df["cell id"].tolist() == ["cell-4"]
+    assert session.body_list[-1]["start_cursor"] == "4"
+    assert notion.get_data_from_cache("db", cache)["cell id"].tolist() == [
+        f"cell-{i}" for i in range(5)]
+
+
+def test_client_does_not_retry_client_errors(monkeypatch):
+    session = FlakySession(3)
+    session.status_code_list = [400]
+    client = make_client(session)
+
+    with pytest.raises(requests.HTTPError):
+        client.query_database("db")
+    assert client.n_retries == 0
+
+
+def test_token_bucket(monkeypatch):
+    sleep_list = []
+    monkeypatch.setattr(notion.time, "sleep", sleep_list.append)
+    monkeypatch.setattr(notion.time, "monotonic", lambda: 100.0)
+    bucket = notion.TokenBucket(rate=2)
+
+    # a burst of two, then one request every half second
+    assert [bucket.acquire() for _ in range(4)] == [0, 0, 0.5, 1.0]
+    assert sleep_list == [0.5, 1.0]
+
+
+def test_page_cache(tmp_path, monkeypatch):
+    cache = notion.PageCache(str(tmp_path / "cache.sqlite"))
+    session = FakeSession(4)
+    client = make_client(session)
+    df = notion.get_data_from_notion("db", client, cache=cache)
+    pd.testing.assert_frame_equal(notion.get_data_from_cache("db", cache), df)
+
+    # unchanged pages are not parsed again
+    session.page_list[1] = {**make_page(1), "last_edited_time": "2023-11-22T08:00:00.000Z"}
+    session.page_list[1]["properties"]["English"]["rich_text"][0]["plain_text"] = "new"
+    extracted_list = []
+    extract_row = notion._extract_row
+    monkeypatch.setattr(notion, "compile_extractors", lambda schema_dict: None)
+    monkeypatch.setattr(
+        notion, "_extract_row", lambda page: extracted_list.append(page["id"])
+        or extract_row(page))
+    df = notion.get_data_from_notion("db", client, cache=cache)
+    assert extracted_list == ["cell-1"]
+    assert df["English"].tolist() == ["word 0", "new", "word 2", "word 3"]
+
+    # offline replay, after the pages deleted from Notion are dropped
+    cache.keep_only("db", ["cell-0", "cell-1"])
+    offline_df = notion.get_data_from_cache("db", cache)
+    assert offline_df["cell id"].tolist() == ["cell-0", "cell-1"]
+    assert offline_df["English"].tolist() == ["word 0", "new"]
+    assert offline_df["Gender"].isna().all()
+    assert offline_df["date modified"].dtype == "datetime64[ns, UTC]"
+
+
+def test_page_cache_col_list_changed(tmp_path, monkeypatch):
+    cache = notion.PageCache(str(tmp_path / "cache.sqlite"))
+    cache.save("db", [("cell-0", "2023-11-21T12:01:00.000Z", ("mot",) * len(COL_LIST))])
+    assert list(cache.load("db")) == ["cell-0"]
+
+    monkeypatch.setattr(notion, "COL_LIST", COL_LIST[:-1])
+    assert cache.load("db") == {}
+
+
+def test_records_to_df_compact_dtypes():
+    df = notion.get_data_from_notion("db", make_client(FakeSession(3)))
+
+    assert df["French"].dtype == notion.STRING_DTYPE
+    assert df["cell id"].dtype == notion.STRING_DTYPE
+    assert df["Example"].dtype == notion.STRING_DTYPE  # all missing
+    assert df["Part of Speech"].dtype == "category"
+    assert df["Tags"].cat.categories.tolist() == ["a, b"]
+    assert df["Gender"].isna().all()
+    assert df["date modified"].dtype == "datetime64[ns, UTC]"
+    # the steps of the sync still work on it
+    df_valid = mem.validate_input(df)
+    assert df_valid["cell id"].tolist() == ["cell-0", "cell-1", "cell-2"]
+    df_valid, duplicate_res_df = hr.handle_notion_duplicates(df_valid)
+    assert duplicate_res_df.empty
+    memrise_df = pd.DataFrame({"cell id": ["cell-1", "cell-9"], "French": ["mot 1", "x"]})
+    assert ut.anti_join(memrise_df, df, "cell id")["cell id"].tolist() == ["cell-9"]
+    assert ut.semi_join(df, memrise_df, "cell id")["cell id"].tolist() == ["cell-1"]
@@ -0,0 +1,138 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from src import plan as pl
+from src.constants import COL_LIST
+from src.memrise import validate_input
+
+
+def read_data():
+    df = pd.read_csv("tests/data/test.csv")
+    df["date modified"] = pd.to_datetime(df["date modified"])
+    return validate_input(df)
+
+
+def test_make_plan_empty_memrise():
+    notion_df = read_data()
+    plan = pl.make_plan(notion_df, pd.DataFrame(columns=COL_LIST), 4)
+    assert plan.counts == {"duplicate_drop": 0, "duplicate_skip": 0, "delete": 0,
+                           "update": 0, "add": len(notion_df)}
+    # the words are added from the oldest to the newest
+    expected_df = notion_df.sort_values(by="date modified").reset_index(drop=True)
+    assert_frame_equal(plan.to_df("add"), expected_df)
+    assert plan.estimated_round_trips == (
+        pl.ADD_SETUP_ROUND_TRIPS + pl.ADD_LEVEL_ROUND_TRIPS * 3)
+
+
+def test_make_plan():
+    notion_df = read_data()
+    memrise_df = notion_df.copy()
+    memrise_df["level id"] = ["level 1"] * 5 + ["level 2"] * 5
+    deleted_id = notion_df.loc[0, "cell id"]
+    added_id = notion_df.loc[1, "cell id"]
+    memrise_df = memrise_df[memrise_df["cell id"] != added_id]
+    notion_df = notion_df[notion_df["cell id"] != deleted_id].copy()
+    # one update per level, the word of the second level changed first
+    notion_df.loc[7, "English"] = "updated"
+    notion_df.loc[2, "English"] = "updated"
+    notion_df.loc[2, "Gender"] = "f"
+    notion_df.loc[7, "date modified"] = pd.Timestamp("2023-01-01", tz="UTC")
+    # a duplicate of an existing word, newer than it
+    duplicated_id = notion_df.loc[3, "cell id"]
+    duplicate_row = notion_df.loc[[3]].copy()
+    duplicate_row["cell id"] = "duplicate"
+    duplicate_row["French"] = duplicate_row["French"].str.upper()
+    duplicate_row["date modified"] = pd.Timestamp("2030-01-01", tz="UTC")
+    notion_df = pd.concat([notion_df, duplicate_row])
+
+    plan = pl.make_plan(notion_df, memrise_df)
+
+    assert [op.cell_id for op in plan.duplicate_list] == [duplicated_id]
+    # the dropped duplicate is replaced on Memrise by the most recent one
+    assert [op.cell_id for op in plan.delete_list] == [deleted_id, duplicated_id]
+    assert [op.cell_id for op in plan.add_list] == [added_id, "duplicate"]
+    assert [op.level for op in plan.update_list] == ["level 2", "level 1"]
+    assert plan.update_list[1].edits == (("English", "updated"), ("Gender", "f"))
+    assert plan.n_edits == 4
+    assert plan.edit_list() == [
+        (plan.update_list[0].cell_id, "English", "updated"),
+        (plan.update_list[0].cell_id, "date modified", "2023-01-01 00:00:00+00:00"),
+        (plan.update_list[1].cell_id, "English", "updated"),
+        (plan.update_list[1].cell_id, "Gender", "f"),
+    ]
+    assert plan.estimated_round_trips == (
+        2 * pl.DELETE_ROUND_TRIPS
+        + pl.UPDATE_SETUP_ROUND_TRIPS + 2 * pl.UPDATE_LEVEL_ROUND_TRIPS
+        + 4 * pl.UPDATE_CELL_ROUND_TRIPS
+        + pl.ADD_SETUP_ROUND_TRIPS + pl.ADD_LEVEL_ROUND_TRIPS)
+    assert "estimated browser round trips" in plan.summary()
+
+
+def test_make_plan_in_sync():
+    notion_df = read_data()
+    plan = pl.make_plan(notion_df, notion_df.copy())
+    assert plan.is_empty
+    assert plan.estimated_round_trips == 0
+    assert plan.to_df("update").empty
+
+
+def test_make_plan_notion_id_list():
+    notion_df = read_data()
+    # only the last entry was edited since the last run
+    plan = pl.make_plan(notion_df.tail(1), notion_df.copy(),
+                        notion_id_list=notion_df["cell id"].iloc[1:].tolist())
+    assert [op.cell_id for op in plan.delete_list] == [notion_df["cell id"].iloc[0]]
+    assert plan.counts["update"] == plan.counts["add"] == 0
+
+
+def test_plan_level_dict():
+    notion_df = read_data()
+    memrise_df = notion_df.copy()
+    memrise_df["level id"] = ["1"] * 5 + ["2"] * 5
+    notion_df.loc[[2, 7], "English"] = "updated"
+    plan = pl.make_plan(notion_df, memrise_df)
+    assert plan.level_dict() == {notion_df.loc[2, "cell id"]: "1",
+                                 notion_df.loc[7, "cell id"]: "2"}
+    # unknown levels are left out
+    assert pl.make_plan(notion_df, memrise_df[COL_LIST]).level_dict() == {}
+
+
+def test_make_plan_duplicates_on_memrise():
+    notion_df = read_data()
+    memrise_df = notion_df.copy()
+    # only the new entries were edited since the last run. One is the same word as
+    # one on Memrise, typed differently
+    new_df = notion_df.loc[[4, 5]].copy()
+    new_df["cell id"] = ["new 1", "new 2"]
+    new_df.loc[4, "French"] = " " + new_df.loc[4, "French"].upper() + "  "
+    new_df.loc[5, "French"] = "un mot nouveau"
+    notion_id_list = notion_df["cell id"].tolist() + ["new 1", "new 2"]
+    plan = pl.make_plan(new_df, memrise_df, notion_id_list=notion_id_list)
+    assert [op.cell_id for op in plan.skip_list] == ["new 1"]
+    assert [op.cell_id for op in plan.add_list] == ["new 2"]
+    assert plan.counts["duplicate_skip"] == 1
+    # a word being deleted from Memrise doesn't block the new one
+    notion_id_list.remove(notion_df.loc[4, "cell id"])
+    plan = pl.make_plan(new_df, memrise_df, notion_id_list=notion_id_list)
+    assert plan.skip_list == []
+    assert sorted(op.cell_id for op in plan.add_list) == ["new 1", "new 2"]
+
+
+def test_make_plan_duplicates_notion_id_list():
+    notion_df = read_data()
+    memrise_df = notion_df.copy()
+    # a newer copy of a word on Memrise, both edited since the last run
+    duplicated_id = notion_df.loc[3, "cell id"]
+    duplicate_row = notion_df.loc[[3]].copy()
+    duplicate_row["cell id"] = "duplicate"
+    duplicate_row["date modified"] = pd.Timestamp("2030-01-01", tz="UTC")
+    notion_df = pd.concat([notion_df, duplicate_row])
+    edited_df = notion_df[notion_df["cell id"].isin([duplicated_id, "duplicate"])]
+    # the full fetch and the incremental one plan the same
+    for plan in [pl.make_plan(notion_df, memrise_df),
+                 pl.make_plan(edited_df, memrise_df,
+                              notion_id_list=notion_df["cell id"].tolist())]:
+        assert [op.cell_id for op in plan.duplicate_list] == [duplicated_id]
+        assert [op.cell_id for op in plan.delete_list] == [duplicated_id]
+        assert [op.cell_id for op in plan.add_list] == ["duplicate"]
+        assert plan.skip_list == []
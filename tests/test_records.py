@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.constants import COL_LIST
+from src.memrise import validate_input
+from src.records import WordRecord, WordTable
+
+
+def read_data():
+    df = pd.read_csv("tests/data/test.csv")
+    df["date modified"] = pd.to_datetime(df["date modified"])
+    return df
+
+
+def test_word_record():
+    record = WordRecord(range(len(COL_LIST)))
+    assert record.word == 0
+    assert record.cell_id == COL_LIST.index("cell id")
+    assert record["English"] == 1
+    assert [col for col, _ in record.items()] == COL_LIST
+    # no __dict__, only the tuple of values
+    with pytest.raises(AttributeError):
+        record.other = 1
+
+
+def test_word_table_from_df():
+    df = read_data()
+    df.loc[3, "English"] = np.nan  # not valid
+    table = WordTable.from_df(df)
+    assert len(table) == len(df) - 1
+    assert_frame_equal(table.to_df(), validate_input(df).reset_index(drop=True))
+    # validated once
+    assert WordTable.from_df(table) is table
+    assert WordTable.from_df(df.iloc[0]).cell_id_list == [df.loc[0, "cell id"]]
+    with pytest.raises(ValueError):
+        WordTable.from_df([1, 2])
+
+
+def test_word_table():
+    df = read_data()
+    table = WordTable.from_df(df)
+    assert table[2:4].cell_id_list == df["cell id"].iloc[2:4].tolist()
+    assert table[0].word == df.loc[0, "French"]
+    assert table.word_dict() == dict(zip(df["cell id"], df["French"]))
+    selected = table.select(df["cell id"].iloc[[5, 1]])
+    # in the order of the table
+    assert selected.cell_id_list == df["cell id"].iloc[[1, 5]].tolist()
+    assert WordTable().empty and WordTable().to_df().empty
@@ -0,0 +1,33 @@
+import numpy as np
+
+from src.results import RESULT_COL_LIST, ResultCollector, summarize
+
+
+def test_result_collector():
+    collector = ResultCollector()
+    assert list(collector.to_df().columns) == RESULT_COL_LIST
+    collector.add("duplicate_drop", "id 1", True, word="maison")
+    start = len(collector)
+    collector.word_dict.update({"id 2": "chat", "id 3": "chien"})
+    collector.add("update", "id 2", True, duration=1.5, level="7")
+    collector.add("update", "id 3", False, "not found", 0.5, "7")
+
+    res_df = collector.to_df(start)
+    assert res_df.index.tolist() == [0, 1]
+    assert res_df["word"].tolist() == ["chat", "chien"]
+    assert res_df["success"].dtype == bool
+    assert res_df["error"].tolist()[1] == "not found"
+    assert collector.to_df()["word"].tolist() == ["maison", "chat", "chien"]
+
+    summary_df = summarize(collector.to_df())
+    assert summary_df.loc["update", "count"] == 2
+    assert summary_df.loc["update", "success"] == 1
+    assert summary_df.loc["update", "mean_duration"] == 1
+    assert np.isnan(summary_df.loc["duplicate_drop", "mean_duration"])
+
+
+def test_result_collector_errors_dtype():
+    # all succeeded, like the dataframes returned by the handlers
+    collector = ResultCollector()
+    collector.add("add", "id 1", True)
+    assert collector.to_df()["error"].dtype == np.float64
@@ -0,0 +1,73 @@
+import pandas as pd
+from pandas.testing import assert_frame_equal
+
+from src import plan as pl
+from src.constants import COL_LIST, LOCATION_COL_LIST
+from src.memrise import validate_input
+from src.state import StateStore
+
+COURSE_URL = "https://app.memrise.com/course/1/test/edit/"
+
+
+def read_data():
+    df = pd.read_csv("tests/data/test.csv")
+    df["date modified"] = pd.to_datetime(df["date modified"])
+    return validate_input(df)
+
+
+def scanned_words():
+    word_df = read_data()
+    word_df["level id"] = ["1"] * 5 + ["2"] * 5
+    word_df["thing id"] = [str(100 + i) for i in range(len(word_df))]
+    word_df["position"] = list(range(5)) * 2
+    return word_df
+
+
+def test_state_store_never_scanned():
+    with StateStore(":memory:") as state:
+        assert state.load(COURSE_URL) is None
+        # nothing is recorded before a full scan
+        state.upsert(COURSE_URL, read_data())
+        assert state.load(COURSE_URL) is None
+
+
+def test_state_store_replace_and_load(tmp_path):
+    word_df = scanned_words()
+    with StateStore(str(tmp_path / "state.sqlite")) as state:
+        state.replace(COURSE_URL, word_df)
+    # the state survives the connection
+    with StateStore(str(tmp_path / "state.sqlite")) as state:
+        state_df = state.load(COURSE_URL)
+        assert state.connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert list(state_df.columns) == COL_LIST + LOCATION_COL_LIST + ["hash", "key"]
+    assert_frame_equal(state_df[COL_LIST], word_df[COL_LIST], check_dtype=False)
+    assert state_df["level id"].tolist() == word_df["level id"].tolist()
+    assert state_df["key"].tolist() == word_df["French"].str.lower().tolist()
+    # nothing to sync if Notion didn't change
+    assert pl.make_plan(word_df[COL_LIST], state_df).is_empty
+
+
+def test_state_store_upsert_and_delete():
+    word_df = scanned_words()
+    with StateStore(":memory:") as state:
+        state.replace(COURSE_URL, word_df)
+        # an update keeps the location of the word
+        updated_df = word_df.loc[[3], COL_LIST].copy()
+        updated_df["English"] = "updated"
+        # an add only knows the level
+        added_df = updated_df.copy()
+        added_df["cell id"] = "new"
+        added_df["level id"] = "2"
+        state.upsert(COURSE_URL, updated_df)
+        state.upsert(COURSE_URL, added_df)
+        state.delete(COURSE_URL, [word_df.loc[0, "cell id"]])
+        state_df = state.load(COURSE_URL).set_index("cell id")
+
+    assert len(state_df) == len(word_df)
+    assert word_df.loc[0, "cell id"] not in state_df.index
+    updated = state_df.loc[word_df.loc[3, "cell id"]]
+    assert updated["English"] == "updated"
+    assert (updated["level id"], updated["thing id"], updated["position"]) == ("1", "103", 3)
+    assert state_df.loc["new", "level id"] == "2"
+    assert pd.isna(state_df.loc["new", "thing id"])
+    assert state_df.loc["new", "hash"] == state_df.loc[word_df.loc[3, "cell id"], "hash"]
@@ -1,5 +1,8 @@
+import numpy as np
 import pandas as pd
-from src.utils import semi_join, anti_join
+from src.constants import COL_LIST
+from src.utils import (
+    semi_join, anti_join, changed_rows, content_hash, diff_cells, normalize_key)
 
 
 def test_semi_join():
@@ -61,4 +64,79 @@ def test_anti_join():
     df2['key'] = ['key3', 'key4', 'key5', 'key6']
     df1_only = anti_join(df1, df2, ['id', 'key'])
     assert df1_only.reset_index(drop=True).equals(df1.iloc[:2].reset_index(drop=True))
-    
\ No newline at end of file
+    
+def test_joins_keep_columns_and_dtypes():
+    # only the columns of df1, even if df2 has columns with the same names
+    df1 = pd.DataFrame({
+        'id': pd.array(['a', 'b', 'c', None], dtype='string'),
+        'name': ['Alice', 'Bob', 'Charlie', 'David'],
+    })
+    df2 = pd.DataFrame({
+        'id': ['b', 'b', 'd'],
+        'name': ['Bobby', 'Bob', 'Dave'],
+        'extra': [1, 2, 3],
+    })
+    df1_only = semi_join(df1, df2, 'id')
+    assert df1_only.equals(df1.iloc[[1]].reset_index(drop=True))
+    df1_only = anti_join(df1, df2, 'id')
+    assert df1_only.equals(df1.iloc[[0, 2, 3]].reset_index(drop=True))
+
+def test_content_hash():
+    notion_df = pd.DataFrame({
+        'French': pd.array(['un', 'deux', 'trois'], dtype='string'),
+        'English': pd.array(['one', None, '3'], dtype='string'),
+        'date modified': pd.to_datetime(['2023-11-21'] * 3, utc=True),
+    })
+    # as read back from memrise: missing values are NaN and numbers are floats
+    memrise_df = pd.DataFrame({
+        'French': ['un', 'deux', 'trois'],
+        'English': ['one', np.nan, 3.0],
+        'date modified': pd.to_datetime(['2000-01-01'] * 3, utc=True),
+    })
+    col_list = ['French', 'English']
+    assert content_hash(notion_df, col_list).tolist() == content_hash(
+        memrise_df, col_list).tolist()
+    memrise_df.loc[1, 'English'] = 'two'
+    assert (content_hash(notion_df, col_list) != content_hash(
+        memrise_df, col_list)).tolist() == [False, True, False]
+
+def test_changed_rows():
+    notion_df = pd.DataFrame({col: ['a', 'b', 'c'] for col in COL_LIST})
+    notion_df['cell id'] = ['1', '2', '3']
+    memrise_df = notion_df.iloc[:2].copy()
+    # a change in the date only is not a change of content
+    memrise_df['date modified'] = 'old'
+    assert changed_rows(notion_df, memrise_df, 'cell id').empty
+    memrise_df.loc[1, 'English'] = 'old'
+    changed_df = changed_rows(notion_df, memrise_df, 'cell id')
+    assert changed_df.equals(notion_df.iloc[[1]].reset_index(drop=True))
+    # the stored hashes are compared instead of the content, e.g. from the state
+    memrise_df = notion_df.iloc[:2].copy()
+    memrise_df['hash'] = ['stale', content_hash(notion_df.iloc[[1]]).iloc[0]]
+    changed_df = changed_rows(notion_df, memrise_df, 'cell id')
+    assert changed_df.equals(notion_df.iloc[[0]].reset_index(drop=True))
+
+def test_diff_cells():
+    notion_df = pd.DataFrame({col: ['a', 'b', 'c'] for col in COL_LIST})
+    notion_df['cell id'] = ['1', '2', '3']
+    notion_df['Gender'] = [np.nan, 'f', np.nan]
+    memrise_df = notion_df.iloc[:2].copy()
+    assert diff_cells(notion_df, memrise_df, 'cell id') == []
+
+    memrise_df.loc[0, 'English'] = 'old'
+    memrise_df.loc[1, 'Gender'] = np.nan
+    memrise_df.loc[1, 'Example'] = 'old'
+    # the row missing from memrise_df is ignored
+    assert diff_cells(notion_df, memrise_df, 'cell id') == [
+        ('1', 'English', 'a'), ('2', 'Example', 'b'), ('2', 'Gender', 'f')]
+    assert diff_cells(notion_df, memrise_df, 'cell id', ['Gender']) == [
+        ('2', 'Gender', 'f')]
+
+
+def test_normalize_key():
+    assert normalize_key(" Maison\n de  Campagne ") == "maison de campagne"
+    # composed and decomposed accents
+    assert normalize_key("caf\u00e9") == normalize_key("cafe\u0301") == "caf\u00e9"
+    assert normalize_key("STRASSE") == normalize_key("straße")
+    assert normalize_key("où") != normalize_key("ou")
+    assert normalize_key("où", fold_accents=True) == "ou"